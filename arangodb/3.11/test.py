@@ -8,17 +8,50 @@ import os
 import sys
 import time
 import docker
+import boto3
 import subprocess
 import tempfile
+import tarfile
 import logging
+import socket
+import threading
+import random
 import requests
 import json
+import concurrent.futures
+import collections
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from dataclasses import dataclass
 from datetime import datetime
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@dataclass
+class _RunResult:
+    """Outcome of a backup container run"""
+    returncode: int
+    stdout: str = ''
+    stderr: str = ''
+
+def _free_port():
+    """Ask the OS for a currently unused TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('', 0))
+        return sock.getsockname()[1]
+
 class ArangoDBIntegrationTest311:
+    # Reused across runs; it is left in place after cleanup
+    TEST_NETWORK = "planb_test_network"
+    
+    # Locally built runner image and its entrypoint
+    IMAGE = 'gcr.io/apito-cms/plan-b-backup-arangodb:test-311'
+    RUNNER_CMD = ['python3', '/usr/local/bin/runner.py']
+    
     def __init__(self):
         self.client = docker.from_env()
         self.container = None
@@ -27,22 +60,71 @@ class ArangoDBIntegrationTest311:
         self.container_name = None
         self.minio_container_name = None
         self.test_db = "planb_testdb"
-        self.db_port = 8530 + int(time.time()) % 1000  # Dynamic port to avoid conflicts
-        self.minio_port = 9000 + int(time.time()) % 1000  # Dynamic port for MinIO
+        self.db_port = _free_port()  # OS-assigned ports avoid conflicts
+        self.minio_port = _free_port()
+        self.minio_console_port = _free_port()
         self.arango_user = "planb_test"
         self.arango_password = "planb_test_pass"
         self.minio_access_key = "minioadmin"
         self.minio_secret_key = "minioadmin"
         self.minio_bucket = "planb-backups"
+        self._s3_client = None
+        self._s3_lock = threading.Lock()
+        # Parallel multipart transfers for anything above 8MiB
+        self._s3_transfer = TransferConfig(
+            multipart_threshold=8 * 1024 * 1024,
+            multipart_chunksize=8 * 1024 * 1024,
+            max_concurrency=8,
+            use_threads=True
+        )
         
+        # Shared keep-alive session for ArangoDB API calls
+        self.http = requests.Session()
+        self.http.mount('http://', HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        ))
+        
+        # Build the S3 client (botocore model loading) while containers start up
+        threading.Thread(target=lambda: self._s3, daemon=True).start()
+        
+    def _wait_ready(self, name, container, timeout=180.0, poll_interval=0.5):
+        """Wait for the container's Docker healthcheck to pass; fail only once Docker marks it unhealthy or the deadline passes"""
+        deadline = time.monotonic() + timeout
+        last_streak = 0
+        while True:
+            container.reload()
+            health = container.attrs['State'].get('Health') or {}
+            status = health.get('Status')
+            if status == 'healthy':
+                logger.info(f"✅ {name} is ready!")
+                return
+            if status == 'unhealthy':
+                raise Exception(f"{name} marked unhealthy after {health.get('FailingStreak', 0)} failed probes")
+            
+            # 'starting' polls are not failures; Docker's start period and retries decide when to give up
+            streak = health.get('FailingStreak', 0)
+            if streak > last_streak:
+                logger.info(f"⏳ {name} healthcheck failing streak: {streak}")
+            last_streak = streak
+            
+            if time.monotonic() >= deadline:
+                raise Exception(f"{name} not ready after {timeout}s (status: {status})")
+            time.sleep(poll_interval * random.uniform(0.9, 1.1))
+    
+    def create_test_network(self):
+        """Get or create the custom network shared by the test containers"""
+        try:
+            self.test_network = self.client.networks.get(self.TEST_NETWORK)
+        except docker.errors.NotFound:
+            self.test_network = self.client.networks.create(self.TEST_NETWORK, driver="bridge")
+    
     def start_database_container(self):
         """Start ArangoDB latest container for testing"""
         logger.info("🥨 Starting ArangoDB 3.11 container...")
         
         try:
-            # Create a custom network for test containers
-            network_name = f"planb_test_network_{int(time.time())}"
-            self.test_network = self.client.networks.create(network_name, driver="bridge")
             self.container_name = f"planb_test_arangodb_311_{int(time.time())}"
             
             # Start ArangoDB container on custom network
@@ -52,30 +134,24 @@ class ArangoDBIntegrationTest311:
                     "ARANGO_ROOT_PASSWORD": self.arango_password,
                 },
                 ports={'8529/tcp': self.db_port},
+                # Probed by the Docker daemon; the availability endpoint needs no auth.
+                # Failed probes inside the start period don't count, which covers RocksDB init on a cold start
+                healthcheck={
+                    'test': ['CMD-SHELL', 'wget -q -O /dev/null http://localhost:8529/_admin/server/availability || exit 1'],
+                    'interval': 500_000_000,
+                    'timeout': 2_000_000_000,
+                    'retries': 30,
+                    'start_period': 60_000_000_000
+                },
                 detach=True,
                 remove=True,
                 name=self.container_name,
-                network=network_name  # Connect to custom network
+                network=self.test_network.name  # Connect to custom network
             )
             
             # Wait for ArangoDB to be ready
             logger.info("⏳ Waiting for ArangoDB to be ready...")
-            max_attempts = 30
-            for attempt in range(max_attempts):
-                try:
-                    response = requests.get(
-                        f"http://localhost:{self.db_port}/_api/version",
-                        auth=('root', self.arango_password),
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        logger.info("✅ ArangoDB is ready!")
-                        break
-                except requests.exceptions.RequestException:
-                    pass
-                time.sleep(2)
-                if attempt == max_attempts - 1:
-                    raise Exception("ArangoDB failed to start within timeout")
+            self._wait_ready("ArangoDB", self.container)
             
             return True
                         
@@ -98,7 +174,14 @@ class ArangoDBIntegrationTest311:
                     "MINIO_ROOT_USER": self.minio_access_key,
                     "MINIO_ROOT_PASSWORD": self.minio_secret_key,
                 },
-                ports={'9000/tcp': self.minio_port, '9001/tcp': self.minio_port + 1},
+                ports={'9000/tcp': self.minio_port, '9001/tcp': self.minio_console_port},
+                healthcheck={
+                    'test': ['CMD', 'mc', 'ready', 'local'],
+                    'interval': 500_000_000,
+                    'timeout': 2_000_000_000,
+                    'retries': 30,
+                    'start_period': 1_000_000_000
+                },
                 detach=True,
                 remove=True,
                 name=self.minio_container_name,
@@ -107,21 +190,7 @@ class ArangoDBIntegrationTest311:
             
             # Wait for MinIO to be ready
             logger.info("⏳ Waiting for MinIO to be ready...")
-            max_attempts = 30
-            for attempt in range(max_attempts):
-                try:
-                    response = requests.get(
-                        f"http://localhost:{self.minio_port}/minio/health/live",
-                        timeout=5
-                    )
-                    if response.status_code == 200:
-                        logger.info("✅ MinIO is ready!")
-                        break
-                except requests.exceptions.ConnectionError:
-                    pass
-                time.sleep(2)
-                if attempt == max_attempts - 1:
-                    raise Exception("MinIO failed to start within timeout")
+            self._wait_ready("MinIO", self.minio_container)
             
             # Create bucket
             self._create_minio_bucket()
@@ -132,32 +201,40 @@ class ArangoDBIntegrationTest311:
             logger.error(f"❌ Failed to start MinIO container: {e}")
             return False
     
+    @property
+    def _s3(self):
+        """MinIO S3 client, created on first use and reused afterwards"""
+        # boto3's default session is not thread-safe, so build the client under a lock
+        with self._s3_lock:
+            if self._s3_client is None:
+                self._s3_client = boto3.client(
+                    's3',
+                    endpoint_url=f'http://localhost:{self.minio_port}',
+                    aws_access_key_id=self.minio_access_key,
+                    aws_secret_access_key=self.minio_secret_key,
+                    use_ssl=False,
+                    config=Config(max_pool_connections=10, retries={'max_attempts': 3})
+                )
+            return self._s3_client
+    
+    def download_backup(self, key, path):
+        """Download a backup object from MinIO to a local file"""
+        self._s3.download_file(self.minio_bucket, key, path, Config=self._s3_transfer)
+    
     def _create_minio_bucket(self):
-        """Create MinIO bucket for testing"""
+        """Create MinIO bucket for testing, unless it already exists"""
         try:
-            import boto3
-            from botocore.exceptions import ClientError
-            
-            # Initialize MinIO client
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=f'http://localhost:{self.minio_port}',
-                aws_access_key_id=self.minio_access_key,
-                aws_secret_access_key=self.minio_secret_key,
-                use_ssl=False
-            )
+            self._s3.head_bucket(Bucket=self.minio_bucket)
+            logger.info(f"✅ MinIO bucket '{self.minio_bucket}' already exists")
+            
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchBucket'):
+                logger.error(f"❌ Failed to check MinIO bucket: {e}")
+                raise
             
             # Create bucket
-            s3_client.create_bucket(Bucket=self.minio_bucket)
+            self._s3.create_bucket(Bucket=self.minio_bucket)
             logger.info(f"✅ MinIO bucket '{self.minio_bucket}' created successfully")
-            
-        except Exception as e:
-            # Check if it's a ClientError for bucket already exists
-            if hasattr(e, 'response') and e.response.get('Error', {}).get('Code') == 'BucketAlreadyOwnedByYou':
-                logger.info(f"✅ MinIO bucket '{self.minio_bucket}' already exists")
-            else:
-                logger.error(f"❌ Failed to create MinIO bucket: {e}")
-                raise
     
     def setup_test_data(self):
         """Setup test database with IMDB document data"""
@@ -168,7 +245,7 @@ class ArangoDBIntegrationTest311:
             auth = ('root', self.arango_password)
             
             # Create database
-            db_response = requests.post(
+            db_response = self.http.post(
                 f"{base_url}/_api/database",
                 json={"name": self.test_db},
                 auth=auth
@@ -193,7 +270,7 @@ class ArangoDBIntegrationTest311:
             
             for collection_name, documents in collections_data.items():
                 # Create collection
-                collection_response = requests.post(
+                collection_response = self.http.post(
                     f"{base_url}/_db/{self.test_db}/_api/collection",
                     json={"name": collection_name},
                     auth=auth
@@ -202,16 +279,17 @@ class ArangoDBIntegrationTest311:
                 if collection_response.status_code not in [200, 409]:
                     raise Exception(f"Failed to create collection {collection_name}: {collection_response.text}")
                 
-                # Insert documents
-                for doc in documents:
-                    doc_response = requests.post(
-                        f"{base_url}/_db/{self.test_db}/_api/document/{collection_name}",
-                        json=doc,
-                        auth=auth
-                    )
-                    
-                    if doc_response.status_code not in [201, 202]:
-                        raise Exception(f"Failed to insert document: {doc_response.text}")
+                # Insert all documents in one bulk import request (JSON lines)
+                import_response = self.http.post(
+                    f"{base_url}/_db/{self.test_db}/_api/import",
+                    params={"type": "documents", "collection": collection_name, "complete": "true"},
+                    data="\n".join(json.dumps(doc) for doc in documents),
+                    headers={'Content-Type': 'application/x-ldjson'},
+                    auth=auth
+                )
+                
+                if import_response.status_code != 201:
+                    raise Exception(f"Failed to import documents into {collection_name}: {import_response.text}")
             
             logger.info(f"✅ Test data created: {len(collections_data['movies'])} movies, {len(collections_data['actors'])} actors")
             return True
@@ -220,21 +298,37 @@ class ArangoDBIntegrationTest311:
             logger.error(f"❌ Failed to setup test data: {e}")
             return False
     
+    def _run_streaming(self, cmd, **kwargs):
+        """Run a command, logging its output line by line as it arrives.
+        
+        Returns the exit code and the last 200 lines of output for error reporting.
+        """
+        tail = collections.deque(maxlen=200)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1, **kwargs)
+        for line in proc.stdout:
+            line = line.rstrip()
+            logger.info(line)
+            tail.append(line)
+        return proc.wait(), '\n'.join(tail)
+    
     def build_container(self):
         """Build our Plan B ArangoDB container for testing (native platform)"""
         logger.info("🔨 Building Plan B ArangoDB container for testing...")
         
         try:
             # Build for native platform (ARM64) for local testing
-            build_result = subprocess.run([
-                'docker', 'build', 
+            # BuildKit reuses layers from the last pushed image via its inline cache
+            returncode, output = self._run_streaming([
+                'docker', 'build',
+                '--cache-from', 'gcr.io/apito-cms/plan-b-backup-arangodb:3.11',
+                '--build-arg', 'BUILDKIT_INLINE_CACHE=1',
                 '-f', './arangodb/3.11/Dockerfile',
-                '-t', 'gcr.io/apito-cms/plan-b-backup-arangodb:test-311',
+                '-t', self.IMAGE,
                 '.'
-            ], capture_output=True, text=True, cwd='/Users/diablo/Projects/react/backup-runner')
+            ], cwd='/Users/diablo/Projects/react/backup-runner', env={**os.environ, 'DOCKER_BUILDKIT': '1'})
             
-            if build_result.returncode != 0:
-                raise Exception(f"Failed to build container: {build_result.stderr}")
+            if returncode != 0:
+                raise Exception(f"Failed to build container: {output}")
             
             logger.info("✅ Container built successfully for local testing!")
             return True
@@ -256,49 +350,46 @@ class ArangoDBIntegrationTest311:
             
             # Use container name for network resolution (Docker internal DNS)
             logger.info(f"Using MinIO container name: {self.minio_container_name}")
+            env = self._backup_env(backup_path, timestamp)
             
             # Use Docker Python client instead of subprocess
             try:
-                backup_output = self.client.containers.run(
-                    'gcr.io/apito-cms/plan-b-backup-arangodb:test-311',
-                    command=['python3', '/usr/local/bin/runner.py'],
-                    environment={
-                        # Database connection
-                        'DB_HOST': self.container_name,  # Use container name for internal network
-                        'DB_PORT': '8529',
-                        'DB_NAME': self.test_db,
-                        'DB_USERNAME': 'root',
-                        'DB_PASSWORD': self.arango_password,
-                        
-                        # Storage configuration (use host networking for simplicity)
-                        'STORAGE_TYPE': 's3',
-                        'STORAGE_ENDPOINT': f'http://host.docker.internal:{self.minio_port}',  # Use host gateway
-                        'STORAGE_BUCKET': self.minio_bucket,
-                        'STORAGE_REGION': 'us-east-1',
-                        'STORAGE_ACCESS_KEY_ID': self.minio_access_key,
-                        'STORAGE_SECRET_ACCESS_KEY': self.minio_secret_key,
-                        'BACKUP_PATH': backup_path,
-                        
-                        # Job configuration
-                        'JOB_ID': f'test-job-{timestamp}',
-                        'RETENTION_DAYS': '30',
-                        'CALLBACK_URL': '',  # No callback for testing
-                        'CALLBACK_SECRET': ''
-                    },
-                    network=self.test_network.name,  # Use same network as database and MinIO
-                    remove=True,
-                    detach=False
-                )
+                # Retry transient daemon errors with the same environment
+                for attempt in range(3):
+                    try:
+                        backup_container = self.client.containers.run(
+                            self.IMAGE,
+                            command=self.RUNNER_CMD,
+                            environment=env,
+                            network=self.test_network.name,  # Use same network as database and MinIO
+                            detach=True
+                        )
+                        break
+                    except docker.errors.APIError as e:
+                        if attempt == 2:
+                            raise
+                        logger.warning(f"⚠️  Backup container start failed (attempt {attempt + 1}), retrying: {e}")
+                        time.sleep(1 << attempt)
+                
+                try:
+                    # Log output line by line as the runner produces it
+                    for line in backup_container.logs(stream=True, follow=True):
+                        logger.info(f"Container output: {line.decode('utf-8', 'replace').rstrip()}")
+                    status_code = backup_container.wait()['StatusCode']
+                finally:
+                    backup_container.remove(force=True)
                 
-                # Container ran successfully
-                backup_result = type('obj', (object,), {'returncode': 0, 'stdout': backup_output.decode('utf-8'), 'stderr': ''})()
-                logger.info(f"Container output: {backup_output.decode('utf-8')}")
+                if status_code == 0:
+                    backup_result = _RunResult(0)
+                else:
+                    error_msg = f"Container exited with status {status_code}"
+                    backup_result = _RunResult(status_code, '', error_msg)
                 
             except Exception as container_error:
                 # Container failed
                 error_msg = str(container_error)
                 logger.error(f"Container execution failed: {error_msg}")
-                backup_result = type('obj', (object,), {'returncode': 1, 'stdout': '', 'stderr': error_msg})()
+                backup_result = _RunResult(1, '', error_msg)
             
             if backup_result.returncode == 0:
                 logger.info("✅ Complete backup pipeline executed successfully!")
@@ -319,25 +410,56 @@ class ArangoDBIntegrationTest311:
             logger.error(f"❌ Backup test failed: {e}")
             return False
     
+    def _backup_env(self, backup_path, timestamp):
+        """Environment for the runner container"""
+        return {
+            # Database connection
+            'DB_HOST': self.container_name,  # Use container name for internal network
+            'DB_PORT': '8529',
+            'DB_NAME': self.test_db,
+            'DB_USERNAME': 'root',
+            'DB_PASSWORD': self.arango_password,
+            
+            # Storage configuration (use host networking for simplicity)
+            'STORAGE_TYPE': 's3',
+            'STORAGE_ENDPOINT': f'http://host.docker.internal:{self.minio_port}',  # Use host gateway
+            'STORAGE_BUCKET': self.minio_bucket,
+            'STORAGE_REGION': 'us-east-1',
+            'STORAGE_ACCESS_KEY_ID': self.minio_access_key,
+            'STORAGE_SECRET_ACCESS_KEY': self.minio_secret_key,
+            'BACKUP_PATH': backup_path,
+            
+            # Job configuration
+            'JOB_ID': f'test-job-{timestamp}',
+            'RETENTION_DAYS': '30',
+            'CALLBACK_URL': '',  # No callback for testing
+            'CALLBACK_SECRET': ''
+        }
+    
     def _verify_backup_upload(self, backup_path):
         """Verify that backup was uploaded to MinIO"""
         try:
-            import boto3
-            from botocore.exceptions import ClientError
-            
-            # Initialize MinIO client
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=f'http://localhost:{self.minio_port}',
-                aws_access_key_id=self.minio_access_key,
-                aws_secret_access_key=self.minio_secret_key,
-                use_ssl=False
-            )
+            # List everything under the backup prefix in one pass instead of a HEAD per key
+            prefix = os.path.dirname(backup_path) + '/'
+            paginator = self._s3.get_paginator('list_objects_v2')
+            found = {}
+            for page in paginator.paginate(Bucket=self.minio_bucket, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    found[obj['Key']] = obj['Size']
+            
+            file_size = found.get(backup_path, 0)
+            if file_size <= 0:
+                logger.error(f"❌ Backup object missing or empty under {prefix}: {sorted(found)}")
+                return False
+            
+            # Pull the archive back and make sure every member reads cleanly
+            with tempfile.TemporaryDirectory() as temp_dir:
+                local_path = os.path.join(temp_dir, os.path.basename(backup_path))
+                self.download_backup(backup_path, local_path)
+                with tarfile.open(local_path, 'r:*') as archive:
+                    member_count = sum(1 for _ in archive)
             
-            # Check if object exists
-            response = s3_client.head_object(Bucket=self.minio_bucket, Key=backup_path)
-            file_size = response['ContentLength']
-            logger.info(f"✅ Backup verified in MinIO: {file_size} bytes")
+            logger.info(f"✅ Backup verified in MinIO: {file_size} bytes, {member_count} archive entries")
             return True
             
         except ClientError as e:
@@ -360,63 +482,50 @@ class ArangoDBIntegrationTest311:
             if auth_result.returncode != 0:
                 logger.warning(f"Docker auth warning: {auth_result.stderr}")
             
-            # Build production image for linux/amd64 (Cloud Run requirement)
-            logger.info("🔨 Building production image for linux/amd64...")
-            build_result = subprocess.run([
-                'docker', 'build', '--platform', 'linux/amd64',
+            # Build for linux/amd64 (Cloud Run requirement) and push in a single buildx step,
+            # reusing layers from the previously pushed image
+            logger.info("🔨 Building and pushing production image for linux/amd64...")
+            returncode, output = self._run_streaming([
+                'docker', 'buildx', 'build', '--platform', 'linux/amd64',
+                '--cache-from', 'gcr.io/apito-cms/plan-b-backup-arangodb:3.11',
+                '--build-arg', 'BUILDKIT_INLINE_CACHE=1',
                 '-f', './arangodb/3.11/Dockerfile',
                 '-t', 'gcr.io/apito-cms/plan-b-backup-arangodb:3.11',
+                '--push',
                 '.'
-            ], capture_output=True, text=True, cwd='/Users/diablo/Projects/react/backup-runner')
-            
-            if build_result.returncode != 0:
-                raise Exception(f"Failed to build production container: {build_result.stderr}")
-            
-            logger.info("✅ Production image built successfully!")
-            
-            # Push to GCR
-            logger.info("⬆️  Pushing to Google Container Registry...")
-            push_result = subprocess.run([
-                'docker', 'push', 'gcr.io/apito-cms/plan-b-backup-arangodb:3.11'
-            ], capture_output=True, text=True)
+            ], cwd='/Users/diablo/Projects/react/backup-runner')
             
-            if push_result.returncode == 0:
+            if returncode == 0:
                 logger.info("✅ Successfully pushed to Google Container Registry!")
                 logger.info("🏷️  Image: gcr.io/apito-cms/plan-b-backup-arangodb:3.11")
                 return True
             else:
-                logger.error(f"❌ Failed to push to GCR: {push_result.stderr}")
+                logger.error(f"❌ Failed to push to GCR: {output}")
                 return False
                 
         except Exception as e:
             logger.error(f"❌ GCR push failed: {e}")
             return False
     
+    def _kill_container(self, name, container):
+        """Force-kill a test container (started with remove=True, so Docker deletes it)"""
+        if not container:
+            return
+        
+        try:
+            container.kill()
+            logger.info(f"✅ {name} test container killed")
+        except:
+            pass
+    
     def cleanup(self):
         """Clean up test resources"""
         logger.info("🧹 Cleaning up...")
         
-        if self.container:
-            try:
-                self.container.stop()
-                logger.info("✅ ArangoDB test container stopped")
-            except:
-                pass
-        
-        if self.minio_container:
-            try:
-                self.minio_container.stop()
-                logger.info("✅ MinIO test container stopped")
-            except:
-                pass
-        
-        # Clean up custom network
-        if hasattr(self, 'test_network'):
-            try:
-                self.test_network.remove()
-                logger.info("✅ Test network removed")
-            except:
-                pass
+        # Test containers hold no state worth a graceful stop; kill both at once
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(self._kill_container, "ArangoDB", self.container)
+            executor.submit(self._kill_container, "MinIO", self.minio_container)
     
     def run_full_test(self):
         """Run complete build, test, and deploy pipeline"""
@@ -424,33 +533,31 @@ class ArangoDBIntegrationTest311:
         logger.info("=" * 60)
         
         try:
-            # Step 1: Start test database container
-            logger.info("📋 Step 1: Starting test database...")
-            if not self.start_database_container():
-                return False
-            
-            # Step 2: Start MinIO S3-compatible storage
-            logger.info("📋 Step 2: Starting MinIO S3 storage...")
-            if not self.start_minio_container():
-                return False
+            # Step 1: Start test database, MinIO and build our container concurrently;
+            # nothing depends on them until test data is loaded
+            logger.info("📋 Step 1: Starting test database and MinIO, building Plan B container...")
+            self.create_test_network()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+                startup = [
+                    executor.submit(self.start_database_container),
+                    executor.submit(self.start_minio_container),
+                    executor.submit(self.build_container)
+                ]
+                if not all([future.result() for future in startup]):
+                    return False
             
-            # Step 3: Setup test data
-            logger.info("📋 Step 3: Setting up test data...")
+            # Step 2: Setup test data
+            logger.info("📋 Step 2: Setting up test data...")
             if not self.setup_test_data():
                 return False
             
-            # Step 4: Build our Plan B container
-            logger.info("📋 Step 4: Building Plan B container...")
-            if not self.build_container():
-                return False
-            
-            # Step 5: Test complete backup pipeline (backup → compress → upload)
-            logger.info("📋 Step 5: Testing complete backup pipeline...")
+            # Step 3: Test complete backup pipeline (backup → compress → upload)
+            logger.info("📋 Step 3: Testing complete backup pipeline...")
             if not self.run_backup_test():
                 return False
             
-            # Step 6: Push to Google Container Registry (only if all tests pass)
-            logger.info("📋 Step 6: Pushing to production registry...")
+            # Step 4: Push to Google Container Registry (only if all tests pass)
+            logger.info("📋 Step 4: Pushing to production registry...")
             if not self.push_to_gcr():
                 logger.error("❌ Failed to push to GCR, but tests passed")
                 return False
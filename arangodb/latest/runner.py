@@ -8,42 +8,81 @@ import os
 import sys
 import subprocess
 import tempfile
+import shutil
 import logging
-import gzip
+import contextlib
+import concurrent.futures
+import collections
+import threading
 import boto3
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from datetime import datetime
-import tarfile
-import io
 
 logger = logging.getLogger(__name__)
 
+# Multipart transfer tuning for large backup archives
+MULTIPART_CHUNKSIZE = 50 * 1024 * 1024
+DOWNLOAD_CHUNKSIZE = 32 * 1024 * 1024
+MAX_TRANSFER_CONCURRENCY = 16
+
+# Outer archive codecs (BACKUP_COMPRESSION). arangodump shards are already
+# gzipped, so both run at their fastest level across all available cores.
+CPU_COUNT = len(os.sched_getaffinity(0))
+ARCHIVE_CODECS = {
+    'gzip': {
+        'compress': ['pigz', '-1', '-p', str(CPU_COUNT)],
+        'decompress': ['pigz', '-dc'],
+        'content_type': 'application/gzip',
+        'content_encoding': 'gzip'
+    },
+    'zstd': {
+        'compress': ['zstd', '-3', f'-T{CPU_COUNT}', '-q', '-c'],
+        'decompress': ['zstd', '-dc', '-q'],
+        'content_type': 'application/zstd',
+        'content_encoding': None
+    }
+}
+
+# Runner configuration: (attribute, environment variable, default, required)
+ENV_FIELDS = (
+    # Database connection
+    ('db_host', 'DB_HOST', None, True),
+    ('db_port', 'DB_PORT', '8529', False),
+    ('db_name', 'DB_NAME', None, True),
+    ('db_username', 'DB_USERNAME', 'root', False),
+    ('db_password', 'DB_PASSWORD', None, False),
+    
+    # Storage configuration
+    ('storage_type', 'STORAGE_TYPE', 's3', False),
+    ('storage_endpoint', 'STORAGE_ENDPOINT', None, True),
+    ('storage_bucket', 'STORAGE_BUCKET', None, True),
+    ('storage_region', 'STORAGE_REGION', 'us-east-1', False),
+    ('storage_access_key_id', 'STORAGE_ACCESS_KEY_ID', None, True),
+    ('storage_secret_access_key', 'STORAGE_SECRET_ACCESS_KEY', None, True),
+    ('backup_path', 'BACKUP_PATH', None, True),
+    
+    # Job configuration
+    ('job_id', 'JOB_ID', None, False),
+    ('retention_days', 'RETENTION_DAYS', '30', False),
+    ('callback_url', 'CALLBACK_URL', None, False),
+    ('callback_secret', 'CALLBACK_SECRET', None, False),
+    ('backup_compression', 'BACKUP_COMPRESSION', 'gzip', False)
+)
+
 class ArangoDBRunner:
     def __init__(self):
         """Initialize ArangoDB runner with environment variables"""
         logger.info("🔧 Initializing ArangoDB runner...")
         
-        # Database connection
-        self.db_host = os.getenv('DB_HOST')
-        self.db_port = os.getenv('DB_PORT', '8529')
-        self.db_name = os.getenv('DB_NAME')
-        self.db_username = os.getenv('DB_USERNAME', 'root')
-        self.db_password = os.getenv('DB_PASSWORD')
-        
-        # Storage configuration
-        self.storage_type = os.getenv('STORAGE_TYPE', 's3')
-        self.storage_endpoint = os.getenv('STORAGE_ENDPOINT')
-        self.storage_bucket = os.getenv('STORAGE_BUCKET')
-        self.storage_region = os.getenv('STORAGE_REGION', 'us-east-1')
-        self.storage_access_key_id = os.getenv('STORAGE_ACCESS_KEY_ID')
-        self.storage_secret_access_key = os.getenv('STORAGE_SECRET_ACCESS_KEY')
-        self.backup_path = os.getenv('BACKUP_PATH')
-        
-        # Job configuration
-        self.job_id = os.getenv('JOB_ID')
-        self.retention_days = os.getenv('RETENTION_DAYS', '30')
-        self.callback_url = os.getenv('CALLBACK_URL')
-        self.callback_secret = os.getenv('CALLBACK_SECRET')
+        # Load configuration from a single pass over the environment
+        env = os.environ
+        for attr, var, default, _ in ENV_FIELDS:
+            setattr(self, attr, env.get(var, default))
+        self.backup_compression = self.backup_compression.lower()
         
         logger.info("🔧 Environment variables loaded")
         
@@ -52,17 +91,25 @@ class ArangoDBRunner:
         
         # Initialize S3 client
         self._init_s3_client()
+        
+        # Reuse one connection pool for callback notifications
+        self._http = requests.Session()
+        callback_adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=2,
+            max_retries=Retry(total=3, backoff_factor=0.5)
+        )
+        self._http.mount('http://', callback_adapter)
+        self._http.mount('https://', callback_adapter)
     
     def _validate_environment(self):
         """Validate required environment variables"""
-        required_vars = [
-            'DB_HOST', 'DB_NAME', 'STORAGE_ENDPOINT', 'STORAGE_BUCKET',
-            'STORAGE_ACCESS_KEY_ID', 'STORAGE_SECRET_ACCESS_KEY', 'BACKUP_PATH'
-        ]
-        
-        missing_vars = [var for var in required_vars if not os.getenv(var)]
+        missing_vars = [var for attr, var, _, required in ENV_FIELDS if required and not getattr(self, attr)]
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+        
+        if self.backup_compression not in ARCHIVE_CODECS:
+            raise ValueError(f"Unsupported BACKUP_COMPRESSION: {self.backup_compression}")
     
     def _init_s3_client(self):
         """Initialize S3 client with credentials"""
@@ -85,6 +132,13 @@ class ArangoDBRunner:
                 region_name=self.storage_region
             )
             
+            # Pool must cover every concurrent part/range worker, or requests queue on it
+            client_config = Config(
+                max_pool_connections=MAX_TRANSFER_CONCURRENCY,
+                retries={'max_attempts': 10, 'mode': 'adaptive'},
+                tcp_keepalive=True
+            )
+            
             # For S3-compatible storage (like MinIO), use custom endpoint
             if self.storage_endpoint and not self.storage_endpoint.startswith('https://s3.'):
                 # Determine SSL usage based on endpoint
@@ -93,28 +147,47 @@ class ArangoDBRunner:
                 self.s3_client = session.client(
                     's3',
                     endpoint_url=self.storage_endpoint,
-                    use_ssl=use_ssl
+                    use_ssl=use_ssl,
+                    config=client_config.merge(Config(s3={'addressing_style': 'path'}))
                 )
             else:
                 # Standard AWS S3
                 logger.info("🔧 Using standard AWS S3")
-                self.s3_client = session.client('s3')
+                self.s3_client = session.client('s3', config=client_config)
                 
             logger.info(f"✅ S3 client initialized for endpoint: {self.storage_endpoint}")
             
-            # Test connectivity
-            try:
-                logger.info("🔧 Testing S3 connectivity...")
-                self.s3_client.list_buckets()
-                logger.info("✅ S3 connectivity test successful")
-            except Exception as conn_error:
-                logger.warning(f"⚠️  S3 connectivity test failed: {conn_error}")
-                # Don't fail here, just warn - the endpoint might be valid but not accessible yet
+            # Test connectivity in the background so the round trip overlaps the dump
+            threading.Thread(target=self._test_s3_connectivity, daemon=True).start()
             
         except Exception as e:
             logger.error(f"❌ Failed to initialize S3 client: {e}")
             raise
     
+    def _test_s3_connectivity(self):
+        """Warn early if the S3 endpoint is not reachable"""
+        try:
+            logger.info("🔧 Testing S3 connectivity...")
+            self.s3_client.list_buckets()
+            logger.info("✅ S3 connectivity test successful")
+        except Exception as conn_error:
+            logger.warning(f"⚠️  S3 connectivity test failed: {conn_error}")
+            # Don't fail here, just warn - the endpoint might be valid but not accessible yet
+    
+    def _run_tool(self, cmd):
+        """Run an ArangoDB client tool, streaming its output to the log as it runs"""
+        # Keep only the last lines around for the error message
+        tail = collections.deque(maxlen=20)
+        
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        for line in proc.stdout:
+            line = line.rstrip()
+            logger.info(f"{cmd[0]}: {line}")
+            tail.append(line)
+        
+        if proc.wait() != 0:
+            raise Exception(f"{cmd[0]} failed: " + '\n'.join(tail))
+    
     def create_backup(self):
         """Create ArangoDB backup using arangodump"""
         logger.info(f"🥨 Creating ArangoDB backup for database: {self.db_name}")
@@ -141,10 +214,7 @@ class ArangoDBRunner:
                 cmd.extend(['--server.password', self.db_password])
             
             logger.info(f"Running arangodump command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                raise Exception(f"arangodump failed: {result.stderr}")
+            self._run_tool(cmd)
             
             logger.info("✅ ArangoDB backup created successfully")
             return backup_dir
@@ -152,91 +222,174 @@ class ArangoDBRunner:
         except Exception as e:
             logger.error(f"❌ Backup creation failed: {e}")
             # Clean up on failure
-            subprocess.run(['rm', '-rf', backup_dir], check=False)
+            shutil.rmtree(backup_dir, ignore_errors=True)
             raise
     
+    @contextlib.contextmanager
     def compress_backup(self, backup_dir):
-        """Compress backup directory to gzip archive"""
-        logger.info(f"🗜️  Compressing backup directory: {backup_dir}")
+        """Stream backup directory as a compressed archive (tar piped through pigz or zstd)"""
+        logger.info(f"🗜️  Compressing backup directory: {backup_dir} ({self.backup_compression})")
+        
+        tar_cmd = ['tar', '-cf', '-', '-C', os.path.dirname(backup_dir), os.path.basename(backup_dir)]
+        compress_cmd = ARCHIVE_CODECS[self.backup_compression]['compress']
+        
+        tar_proc = subprocess.Popen(tar_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        compress_proc = subprocess.Popen(compress_cmd, stdin=tar_proc.stdout, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # Let tar receive SIGPIPE if the compressor exits early
+        tar_proc.stdout.close()
+        
+        threading.Thread(target=self._manage_page_cache, args=(backup_dir, tar_proc), daemon=True).start()
         
         try:
-            # Create temporary compressed file
-            compressed_file = tempfile.NamedTemporaryFile(suffix='.tar.gz', delete=False)
-            compressed_file.close()
-            
-            # Create gzip archive
-            with open(compressed_file.name, 'wb') as f_out:
-                with gzip.GzipFile(fileobj=f_out, mode='wb') as gz_out:
-                    # Create tar archive in memory and compress
-                    tar_buffer = io.BytesIO()
-                    with tarfile.open(fileobj=tar_buffer, mode='w') as tar:
-                        tar.add(backup_dir, arcname=os.path.basename(backup_dir))
-                    
-                    tar_buffer.seek(0)
-                    gz_out.write(tar_buffer.read())
-            
-            # Get file size
-            file_size = os.path.getsize(compressed_file.name)
-            logger.info(f"✅ Backup compressed successfully: {compressed_file.name} ({file_size} bytes)")
-            
-            return compressed_file.name
-            
-        except Exception as e:
-            logger.error(f"❌ Failed to compress backup: {e}")
-            raise
+            yield compress_proc.stdout
+        finally:
+            compress_proc.stdout.close()
+            _, compress_stderr = compress_proc.communicate()
+            _, tar_stderr = tar_proc.communicate()
+        
+        if tar_proc.returncode != 0:
+            raise Exception(f"tar failed: {tar_stderr.decode('utf-8', errors='replace')}")
+        if compress_proc.returncode != 0:
+            raise Exception(f"{compress_cmd[0]} failed: {compress_stderr.decode('utf-8', errors='replace')}")
+        
+        logger.info("✅ Backup compressed successfully")
+    
+    def _manage_page_cache(self, backup_dir, tar_proc):
+        """Read ahead the dump files while tar walks them, then drop them from the page cache"""
+        self._advise_backup_files(backup_dir, 'POSIX_FADV_WILLNEED')
+        # The dump is read exactly once, so keeping it cached only evicts other pages
+        tar_proc.wait()
+        self._advise_backup_files(backup_dir, 'POSIX_FADV_DONTNEED')
+    
+    def _advise_backup_files(self, backup_dir, advice):
+        """Apply a posix_fadvise hint to every file in the backup directory"""
+        if not hasattr(os, advice):
+            return
+        
+        for root, _, files in os.walk(backup_dir):
+            for name in files:
+                try:
+                    fd = os.open(os.path.join(root, name), os.O_RDONLY)
+                    try:
+                        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+                    finally:
+                        os.close(fd)
+                except OSError as e:
+                    logger.debug(f"posix_fadvise skipped for {name}: {e}")
     
-    def upload_to_s3(self, local_file_path):
-        """Upload file to S3-compatible storage"""
+    def upload_to_s3(self, archive):
+        """Stream archive to S3-compatible storage as a multipart upload.
+        
+        Archives that fit in a single part are sent with one put_object instead.
+        Returns the head_object response of the verified upload (the put_object
+        response for single-part archives), or None on failure.
+        """
         logger.info(f"⬆️  Uploading to S3: {self.backup_path}")
         
+        codec = ARCHIVE_CODECS[self.backup_compression]
+        content_args = {'ContentType': codec['content_type']}
+        if codec['content_encoding']:
+            content_args['ContentEncoding'] = codec['content_encoding']
+        
+        upload_id = None
+        
         try:
-            # Upload file
-            self.s3_client.upload_file(
-                local_file_path,
-                self.storage_bucket,
-                self.backup_path,
-                ExtraArgs={
-                    'ContentType': 'application/gzip',
-                    'ContentEncoding': 'gzip'
-                }
-            )
+            try:
+                # Parts are only committed once the archive stream has closed cleanly
+                with archive as stream:
+                    first_part = stream.read(MULTIPART_CHUNKSIZE)
+                    
+                    # Small archives skip the initiate/complete round trips
+                    if len(first_part) == MULTIPART_CHUNKSIZE:
+                        upload_id = self.s3_client.create_multipart_upload(
+                            Bucket=self.storage_bucket,
+                            Key=self.backup_path,
+                            **content_args
+                        )['UploadId']
+                        parts = self._upload_parts(stream, upload_id, first_part)
+                
+                if upload_id:
+                    self.s3_client.complete_multipart_upload(
+                        Bucket=self.storage_bucket,
+                        Key=self.backup_path,
+                        UploadId=upload_id,
+                        MultipartUpload={'Parts': parts}
+                    )
+            except Exception:
+                if upload_id:
+                    self.s3_client.abort_multipart_upload(
+                        Bucket=self.storage_bucket,
+                        Key=self.backup_path,
+                        UploadId=upload_id
+                    )
+                raise
+            
+            if not upload_id:
+                # A successful PUT is already confirmed by its ETag
+                response = self.s3_client.put_object(
+                    Bucket=self.storage_bucket,
+                    Key=self.backup_path,
+                    Body=first_part,
+                    **content_args
+                )
+                logger.info(f"✅ Upload successful: s3://{self.storage_bucket}/{self.backup_path} ({len(first_part)} bytes, ETag: {response['ETag']})")
+                return response
             
             # Verify upload by checking if object exists
             try:
                 response = self.s3_client.head_object(Bucket=self.storage_bucket, Key=self.backup_path)
                 file_size = response['ContentLength']
-                logger.info(f"✅ Upload successful: s3://{self.storage_bucket}/{self.backup_path} ({file_size} bytes)")
-                return True
+                last_modified = response['LastModified']
+                logger.info(f"✅ Upload successful: s3://{self.storage_bucket}/{self.backup_path} ({file_size} bytes, modified: {last_modified})")
+                return response
                 
             except ClientError as e:
                 logger.error(f"❌ Upload verification failed: {e}")
-                return False
+                return None
                 
         except NoCredentialsError:
             logger.error("❌ AWS credentials not found")
-            return False
+            return None
         except ClientError as e:
             logger.error(f"❌ S3 upload failed: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"❌ Upload failed: {e}")
-            return False
+            return None
     
-    def verify_upload(self):
-        """Verify that the uploaded file exists and is accessible"""
-        logger.info(f"🔍 Verifying upload: {self.backup_path}")
+    def _upload_parts(self, stream, upload_id, first_part):
+        """Read the rest of the stream in fixed-size parts and upload them concurrently"""
+        parts = []
+        pending = set()
+        part_number = 1
+        chunk = first_part
         
-        try:
-            response = self.s3_client.head_object(Bucket=self.storage_bucket, Key=self.backup_path)
-            file_size = response['ContentLength']
-            last_modified = response['LastModified']
-            
-            logger.info(f"✅ Upload verified: {file_size} bytes, modified: {last_modified}")
-            return True
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_TRANSFER_CONCURRENCY) as executor:
+            while chunk:
+                # Bound buffered memory to one part per worker
+                if len(pending) >= MAX_TRANSFER_CONCURRENCY:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    parts.extend(future.result() for future in done)
+                
+                pending.add(executor.submit(self._upload_part, upload_id, part_number, chunk))
+                part_number += 1
+                chunk = stream.read(MULTIPART_CHUNKSIZE)
             
-        except ClientError as e:
-            logger.error(f"❌ Upload verification failed: {e}")
-            return False
+            parts.extend(future.result() for future in concurrent.futures.as_completed(pending))
+        
+        logger.info(f"✅ Uploaded {len(parts)} parts")
+        return sorted(parts, key=lambda part: part['PartNumber'])
+    
+    def _upload_part(self, upload_id, part_number, data):
+        """Upload a single multipart part"""
+        response = self.s3_client.upload_part(
+            Bucket=self.storage_bucket,
+            Key=self.backup_path,
+            PartNumber=part_number,
+            UploadId=upload_id,
+            Body=data
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
     
     def send_callback(self, success=True, message=""):
         """Send callback notification to webhook"""
@@ -245,8 +398,6 @@ class ArangoDBRunner:
             return
         
         try:
-            import requests
-            
             payload = {
                 'job_id': self.job_id,
                 'status': 'completed' if success else 'failed',
@@ -258,7 +409,7 @@ class ArangoDBRunner:
             if self.callback_secret:
                 headers['Authorization'] = f'Bearer {self.callback_secret}'
             
-            response = requests.post(
+            response = self._http.post(
                 self.callback_url,
                 json=payload,
                 headers=headers,
@@ -274,33 +425,23 @@ class ArangoDBRunner:
             logger.warning(f"⚠️  Failed to send callback notification: {e}")
     
     def run_backup(self):
-        """Complete backup pipeline: backup → compress → upload → verify"""
+        """Complete backup pipeline: backup → compress/upload/verify"""
         logger.info("🚀 Starting ArangoDB backup pipeline...")
         
         backup_dir = None
-        compressed_file = None
         
         try:
             # Step 1: Create backup
             logger.info("📋 Step 1: Creating database backup...")
             backup_dir = self.create_backup()
             
-            # Step 2: Compress backup
-            logger.info("📋 Step 2: Compressing backup...")
-            compressed_file = self.compress_backup(backup_dir)
-            
-            # Step 3: Upload to S3
-            logger.info("📋 Step 3: Uploading to S3...")
-            if not self.upload_to_s3(compressed_file):
+            # Step 2: Compress backup and stream it to S3 (verified via head_object)
+            logger.info("📋 Step 2: Compressing and uploading to S3...")
+            if not self.upload_to_s3(self.compress_backup(backup_dir)):
                 raise Exception("S3 upload failed")
             
-            # Step 4: Verify upload
-            logger.info("📋 Step 4: Verifying upload...")
-            if not self.verify_upload():
-                raise Exception("Upload verification failed")
-            
-            # Step 5: Send success callback
-            logger.info("📋 Step 5: Sending success notification...")
+            # Step 3: Send success callback
+            logger.info("📋 Step 3: Sending success notification...")
             self.send_callback(success=True, message="Backup completed successfully")
             
             logger.info("🎉 ArangoDB backup pipeline completed successfully!")
@@ -314,9 +455,32 @@ class ArangoDBRunner:
         finally:
             # Cleanup temporary files
             if backup_dir and os.path.exists(backup_dir):
-                subprocess.run(['rm', '-rf', backup_dir], check=False)
-            if compressed_file and os.path.exists(compressed_file):
-                os.unlink(compressed_file)
+                shutil.rmtree(backup_dir, ignore_errors=True)
+    
+    def _stream_backup(self, backup_path, size, out):
+        """Fetch the backup object with concurrent ranged GETs and write it to out in order"""
+        pending = collections.deque()
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_TRANSFER_CONCURRENCY) as executor:
+            for start in range(0, size, DOWNLOAD_CHUNKSIZE):
+                # Bound read-ahead to one range per worker
+                if len(pending) >= MAX_TRANSFER_CONCURRENCY:
+                    out.write(pending.popleft().result())
+                
+                end = min(start + DOWNLOAD_CHUNKSIZE, size) - 1
+                pending.append(executor.submit(self._download_range, backup_path, start, end))
+            
+            while pending:
+                out.write(pending.popleft().result())
+    
+    def _download_range(self, backup_path, start, end):
+        """Fetch one byte range of the backup object"""
+        response = self.s3_client.get_object(
+            Bucket=self.storage_bucket,
+            Key=backup_path,
+            Range=f"bytes={start}-{end}"
+        )
+        return response['Body'].read()
     
     def restore_backup(self, backup_path=None):
         """Restore ArangoDB backup using arangorestore"""
@@ -325,18 +489,29 @@ class ArangoDBRunner:
         
         logger.info(f"🔄 Restoring ArangoDB backup from: {backup_path}")
         
-        # Download backup from S3
-        temp_file = tempfile.NamedTemporaryFile(suffix='.tar.gz', delete=False)
-        temp_file.close()
+        restore_dir = tempfile.mkdtemp(suffix='_arangodb_restore')
         
         try:
-            # Download from S3
-            self.s3_client.download_file(self.storage_bucket, backup_path, temp_file.name)
-            logger.info("✅ Backup downloaded from S3")
+            head = self.s3_client.head_object(Bucket=self.storage_bucket, Key=backup_path)
+            # Archives uploaded before BACKUP_COMPRESSION existed are gzip
+            codec_name = 'zstd' if head.get('ContentType') == ARCHIVE_CODECS['zstd']['content_type'] else 'gzip'
+            decompress_cmd = ARCHIVE_CODECS[codec_name]['decompress']
+            
+            # Stream backup from S3 through the decompressor into tar, extracting while downloading
+            decompress_proc = subprocess.Popen(decompress_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            tar_proc = subprocess.Popen(['tar', '-xf', '-', '-C', restore_dir], stdin=decompress_proc.stdout, stderr=subprocess.PIPE)
+            decompress_proc.stdout.close()
+            try:
+                self._stream_backup(backup_path, head['ContentLength'], decompress_proc.stdin)
+            finally:
+                _, decompress_stderr = decompress_proc.communicate()
+                _, tar_stderr = tar_proc.communicate()
             
-            # Extract backup archive to temporary directory
-            restore_dir = tempfile.mkdtemp(suffix='_arangodb_restore')
-            subprocess.run(['tar', '-xzf', temp_file.name, '-C', restore_dir], check=True)
+            if decompress_proc.returncode != 0:
+                raise Exception(f"{decompress_cmd[0]} failed: {decompress_stderr.decode('utf-8', errors='replace')}")
+            if tar_proc.returncode != 0:
+                raise Exception(f"tar extraction failed: {tar_stderr.decode('utf-8', errors='replace')}")
+            logger.info("✅ Backup downloaded and extracted from S3")
             
             # Find the extracted backup directory
             extracted_dirs = os.listdir(restore_dir)
@@ -362,10 +537,7 @@ class ArangoDBRunner:
                 cmd.extend(['--server.password', self.db_password])
             
             logger.info(f"Running arangorestore command: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                raise Exception(f"arangorestore failed: {result.stderr}")
+            self._run_tool(cmd)
             
             logger.info("✅ ArangoDB restore completed successfully")
             return True
@@ -376,10 +548,8 @@ class ArangoDBRunner:
             
         finally:
             # Clean up temporary files
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-            if 'restore_dir' in locals() and os.path.exists(restore_dir):
-                subprocess.run(['rm', '-rf', restore_dir], check=False)
+            if os.path.exists(restore_dir):
+                shutil.rmtree(restore_dir, ignore_errors=True)
 
 if __name__ == '__main__':
     import sys
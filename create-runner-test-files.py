@@ -6,16 +6,23 @@ Generates backup/restore functionality and integration tests
 
 import os
 import json
+import types
+import functools
+import collections
+import concurrent.futures
 from pathlib import Path
 
+# Directories never holding database versions; pruned so os.walk doesn't descend into them
+SKIPPED_DIRECTORIES = frozenset({'shared', 'templates', '.git', 'node_modules', '__pycache__'})
+
 def get_database_directories():
     """Get all database directories with backup.py files"""
     directories = []
     for root, dirs, files in os.walk('.'):
+        # Skip shared and templates directories (and other non-database trees)
+        dirs[:] = [d for d in dirs if d not in SKIPPED_DIRECTORIES]
         if 'backup.py' in files and root != '.':
-            # Skip shared and templates directories
-            if 'shared' not in root and 'templates' not in root:
-                directories.append(root)
+            directories.append(root)
     return sorted(directories)
 
 def create_postgresql_runner(db_path, version):
@@ -33,95 +40,102 @@ import logging
 
 # Add shared directory to path
 sys.path.append('/app')
-from backup_base import BackupRunnerBase
+from backup_base import BackupRunnerBase, BACKUP_TMPDIR, cli_main
 
 logger = logging.getLogger(__name__)
 
+# Parallel pg_dump/pg_restore workers, each holding its own database connection
+DUMP_JOBS = int(os.environ.get('PGDUMP_JOBS', min(8, len(os.sched_getaffinity(0)))))
+
 class PostgreSQLRunner(BackupRunnerBase):
     def create_backup(self):
-        """Create PostgreSQL backup using pg_dump"""
-        conn = self.job_config['connection']
-        
-        # Create temporary backup file
-        with tempfile.NamedTemporaryFile(mode='w+b', delete=False, suffix='.postgresql') as f:
-            backup_file = f.name
-        
-        # Set environment for pg_dump
-        env = os.environ.copy()
-        env['PGPASSWORD'] = conn['password']
-        
-        # Build pg_dump command
-        cmd = [
-            'pg_dump',
-            '--host', conn['host'],
-            '--port', str(conn['port']),
-            '--username', conn['username'],
-            '--dbname', conn['database'],
-            '--verbose',
-            '--no-password',
-            '--format=custom',
-            '--compress=9',
-            '--no-privileges',
-            '--no-owner',
-            '--file', backup_file
-        ]
-        
-        logger.info(f"Running pg_dump for database {{conn['database']}}")
-        result = subprocess.run(cmd, env=env, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            raise Exception(f"pg_dump failed: {{result.stderr}}")
-        
-        logger.info("PostgreSQL backup completed")
-        return backup_file
+        """Create PostgreSQL backup using a parallel pg_dump"""
+        conn = self.job_config.connection
+        
+        # Create temporary backup file to hold the tarred dump directory
+        with self.backup_tempfile('.postgresql.dir.tar') as backup_file:
+            # Set environment for pg_dump
+            env = os.environ.copy()
+            env['PGPASSWORD'] = conn.password
+            
+            # Build pg_dump command
+            cmd = [
+                'pg_dump',
+                '--host', conn.host,
+                '--port', str(conn.port),
+                '--username', conn.username,
+                '--dbname', conn.database,
+                '--verbose',
+                '--no-password',
+                '--format=directory',  # Dumps tables in parallel, compressing each table file
+                f'--jobs={{DUMP_JOBS}}',
+                '--no-privileges',
+                '--no-owner'
+            ]
+            
+            logger.info(f"Running pg_dump for database {{conn.database}}")
+            with tempfile.TemporaryDirectory(suffix='_postgresql_dump', dir=BACKUP_TMPDIR) as dump_root:
+                dump_dir = os.path.join(dump_root, 'dump')
+                returncode, stderr_tail = self.run_logged(cmd + ['--file', dump_dir], env=env)
+                
+                if returncode != 0:
+                    raise Exception(f"pg_dump failed: {{stderr_tail}}")
+                
+                # Table files are already compressed, so the tarball itself is not
+                returncode, stderr_tail = self.run_logged(['tar', '-cf', backup_file, '-C', dump_dir, '.'])
+                
+                if returncode != 0:
+                    raise Exception(f"tar failed: {{stderr_tail}}")
+            
+            logger.info("PostgreSQL backup completed")
+            return backup_file
 
     def restore_backup(self, backup_file, target_config=None):
         """Restore PostgreSQL backup using pg_restore"""
-        conn = target_config or self.job_config['connection']
+        conn = target_config or self.job_config.connection
         
         # Set environment for pg_restore
         env = os.environ.copy()
-        env['PGPASSWORD'] = conn['password']
+        env['PGPASSWORD'] = conn.password
         
         # Build pg_restore command
         cmd = [
             'pg_restore',
-            '--host', conn['host'],
-            '--port', str(conn['port']),
-            '--username', conn['username'],
-            '--dbname', conn['database'],
+            '--host', conn.host,
+            '--port', str(conn.port),
+            '--username', conn.username,
+            '--dbname', conn.database,
             '--verbose',
             '--no-password',
             '--clean',
             '--create',
-            '--if-exists',
-            backup_file
+            '--if-exists'
         ]
         
-        logger.info(f"Running pg_restore for database {{conn['database']}}")
-        result = subprocess.run(cmd, env=env, capture_output=True, text=True)
-        
-        if result.returncode != 0:
+        logger.info(f"Running pg_restore for database {{conn.database}}")
+        if backup_file.endswith('.tar'):
+            # Directory-format dumps restore table data in parallel
+            with tempfile.TemporaryDirectory(suffix='_postgresql_restore', dir=BACKUP_TMPDIR) as dump_dir:
+                returncode, stderr_tail = self.run_logged(['tar', '-xf', backup_file, '-C', dump_dir])
+                if returncode != 0:
+                    raise Exception(f"tar failed: {{stderr_tail}}")
+                returncode, stderr_tail = self.run_logged(cmd + [f'--jobs={{DUMP_JOBS}}', dump_dir], env=env)
+        elif backup_file.endswith('.gz'):
+            # Gzipped custom-format archives from older runners; pg_restore reads them from stdin, serially
+            with subprocess.Popen(['gzip', '-dc', backup_file], stdout=subprocess.PIPE) as decompress_proc:
+                returncode, stderr_tail = self.run_logged(cmd, env=env, stdin=decompress_proc.stdout)
+        else:
+            returncode, stderr_tail = self.run_logged(cmd + [f'--jobs={{DUMP_JOBS}}', backup_file], env=env)
+        
+        if returncode != 0:
             # pg_restore often returns non-zero even on success due to warnings
-            if "ERROR" in result.stderr.upper():
-                raise Exception(f"pg_restore failed: {{result.stderr}}")
+            if "ERROR" in stderr_tail.upper():
+                raise Exception(f"pg_restore failed: {{stderr_tail}}")
             else:
-                logger.warning(f"pg_restore completed with warnings: {{result.stderr}}")
+                logger.warning(f"pg_restore completed with warnings: {{stderr_tail}}")
         
         logger.info("PostgreSQL restore completed")
         return True
-
-if __name__ == '__main__':
-    import sys
-    runner = PostgreSQLRunner()
-    
-    if len(sys.argv) > 1 and sys.argv[1] == 'restore':
-        if len(sys.argv) < 3:
-            print("Usage: python runner.py restore <backup_file>")
-            sys.exit(1)
-        runner.restore_backup(sys.argv[2])
-    else:
-        runner.run_backup()
 '''
 
 def create_mysql_runner(db_path, version):
@@ -139,83 +153,90 @@ import logging
 
 # Add shared directory to path
 sys.path.append('/app')
-from backup_base import BackupRunnerBase
+from backup_base import BackupRunnerBase, BACKUP_TMPDIR, cli_main
 
 logger = logging.getLogger(__name__)
 
 class MySQLRunner(BackupRunnerBase):
     def create_backup(self):
         """Create MySQL backup using mysqldump"""
-        conn = self.job_config['connection']
-        
-        # Create temporary backup file
-        with tempfile.NamedTemporaryFile(mode='w+b', delete=False, suffix='.mysql.sql') as f:
-            backup_file = f.name
-        
-        # Build mysqldump command
-        cmd = [
-            'mysqldump',
-            f"--host={{conn['host']}}",
-            f"--port={{conn['port']}}",
-            f"--user={{conn['username']}}",
-            f"--password={{conn['password']}}",
-            '--single-transaction',
-            '--routines',
-            '--triggers',
-            '--events',
-            '--set-gtid-purged=OFF',
-            '--default-character-set=utf8mb4',
-            conn['database']
-        ]
-        
-        logger.info(f"Running mysqldump for database {{conn['database']}}")
-        
-        with open(backup_file, 'w') as f:
-            result = subprocess.run(cmd, stdout=f, stderr=subprocess.PIPE, text=True)
-        
-        if result.returncode != 0:
-            raise Exception(f"mysqldump failed: {{result.stderr}}")
+        conn = self.job_config.connection
         
-        logger.info("MySQL backup completed")
-        return backup_file
+        # Create temporary backup file; the dump is compressed on its way in
+        with self.backup_tempfile('.mysql.sql.gz') as backup_file, tempfile.TemporaryDirectory(dir=BACKUP_TMPDIR) as temp_dir:
+            defaults_file = self._write_client_defaults(temp_dir, conn.password)
+            
+            # Build mysqldump command; --defaults-extra-file must come first
+            cmd = [
+                'mysqldump',
+                f"--defaults-extra-file={{defaults_file}}",
+                f"--host={{conn.host}}",
+                f"--port={{conn.port}}",
+                f"--user={{conn.username}}",
+                '--single-transaction',
+                '--quick',  # Stream rows instead of buffering whole tables in the client
+                '--net-buffer-length=2097152',  # Fewer, larger INSERTs; stays under the 4MiB default max_allowed_packet on restore
+                '--routines',
+                '--triggers',
+                '--events',
+                '--set-gtid-purged=OFF',
+                '--default-character-set=utf8mb4',
+                conn.database
+            ]
+            
+            logger.info(f"Running mysqldump for database {{conn.database}}")
+            
+            # mysqldump writes straight into the compressor, so the plain SQL never touches disk
+            returncode, stderr_tail = self.run_compressed(cmd, backup_file)
+            
+            if returncode != 0:
+                raise Exception(f"mysqldump failed: {{stderr_tail}}")
+            
+            logger.info("MySQL backup completed")
+            return backup_file
 
     def restore_backup(self, backup_file, target_config=None):
         """Restore MySQL backup using mysql client"""
-        conn = target_config or self.job_config['connection']
-        
-        # Build mysql restore command
-        cmd = [
-            'mysql',
-            f"--host={{conn['host']}}",
-            f"--port={{conn['port']}}",
-            f"--user={{conn['username']}}",
-            f"--password={{conn['password']}}",
-            '--default-character-set=utf8mb4',
-            conn['database']
-        ]
+        conn = target_config or self.job_config.connection
         
-        logger.info(f"Running mysql restore for database {{conn['database']}}")
-        
-        with open(backup_file, 'r') as f:
-            result = subprocess.run(cmd, stdin=f, capture_output=True, text=True)
+        with tempfile.TemporaryDirectory(dir=BACKUP_TMPDIR) as temp_dir:
+            defaults_file = self._write_client_defaults(temp_dir, conn.password)
+            
+            # Build mysql restore command; --defaults-extra-file must come first
+            cmd = [
+                'mysql',
+                f"--defaults-extra-file={{defaults_file}}",
+                f"--host={{conn.host}}",
+                f"--port={{conn.port}}",
+                f"--user={{conn.username}}",
+                '--default-character-set=utf8mb4',
+                conn.database
+            ]
+            
+            logger.info(f"Running mysql restore for database {{conn.database}}")
+            
+            if backup_file.endswith('.gz'):
+                # Decompress on the fly; the plain SQL never touches disk
+                with subprocess.Popen(['gzip', '-dc', backup_file], stdout=subprocess.PIPE) as decompress_proc:
+                    returncode, stderr_tail = self.run_logged(cmd, stdin=decompress_proc.stdout)
+            else:
+                with open(backup_file, 'rb') as f:
+                    returncode, stderr_tail = self.run_logged(cmd, stdin=f)
         
-        if result.returncode != 0:
-            raise Exception(f"mysql restore failed: {{result.stderr}}")
+        if returncode != 0:
+            raise Exception(f"mysql restore failed: {{stderr_tail}}")
         
         logger.info("MySQL restore completed")
         return True
 
-if __name__ == '__main__':
-    import sys
-    runner = MySQLRunner()
-    
-    if len(sys.argv) > 1 and sys.argv[1] == 'restore':
-        if len(sys.argv) < 3:
-            print("Usage: python runner.py restore <backup_file>")
-            sys.exit(1)
-        runner.restore_backup(sys.argv[2])
-    else:
-        runner.run_backup()
+    def _write_client_defaults(self, directory, password):
+        """Write the password to a private option file so it stays off argv and out of the logs"""
+        defaults_file = os.path.join(directory, 'client.cnf')
+        password = (password or '').replace('\\\\', '\\\\\\\\').replace('"', '\\\\"')
+        fd = os.open(defaults_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(f'[client]\\npassword="{{password}}"\\n')
+        return defaults_file
 '''
 
 def create_mongodb_runner(db_path, version):
@@ -227,113 +248,115 @@ Backup and restore functionality using official MongoDB tools
 
 import os
 import sys
+import shutil
+import tarfile
 import subprocess
 import tempfile
 import logging
 
 # Add shared directory to path
 sys.path.append('/app')
-from backup_base import BackupRunnerBase
+from backup_base import BackupRunnerBase, cli_main
 
 logger = logging.getLogger(__name__)
 
+# Optional connection settings and the mongodump/mongorestore flags that carry them
+AUTH_FLAGS = (
+    ('username', '--username'),
+    ('password', '--password'),
+    ('auth_database', '--authenticationDatabase')
+)
+
 class MongoDBRunner(BackupRunnerBase):
+    @staticmethod
+    def _auth_args(conn):
+        """Authentication flags for the settings present on the connection"""
+        args = []
+        for attr, flag in AUTH_FLAGS:
+            value = getattr(conn, attr)
+            if value:
+                args.extend([flag, value])
+        return args
+
     def create_backup(self):
         """Create MongoDB backup using mongodump"""
-        conn = self.job_config['connection']
-        
-        # Create temporary backup directory
-        backup_dir = tempfile.mkdtemp(suffix='_mongodb_backup')
-        
-        # Build mongodump command
-        cmd = [
-            'mongodump',
-            '--host', f"{{conn['host']}}:{{conn['port']}}",
-            '--db', conn['database'],
-            '--out', backup_dir,
-            '--gzip'
-        ]
-        
-        # Add authentication if provided
-        if conn.get('username'):
-            cmd.extend(['--username', conn['username']])
-        if conn.get('password'):
-            cmd.extend(['--password', conn['password']])
-        if conn.get('authDatabase'):
-            cmd.extend(['--authenticationDatabase', conn['authDatabase']])
-        
-        logger.info(f"Running mongodump for database {{conn['database']}}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            raise Exception(f"mongodump failed: {{result.stderr}}")
-        
-        # Create compressed archive of the backup
-        archive_file = f"{{backup_dir}}.tar.gz"
-        subprocess.run(['tar', '-czf', archive_file, '-C', os.path.dirname(backup_dir), os.path.basename(backup_dir)])
-        
-        # Clean up temporary directory
-        subprocess.run(['rm', '-rf', backup_dir])
-        
-        logger.info("MongoDB backup completed")
-        return archive_file
+        conn = self.job_config.connection
+        
+        # Create temporary backup file; mongodump writes its gzipped single-file archive to it
+        with self.backup_tempfile('.mongodb.archive') as backup_file:
+            # Build mongodump command
+            cmd = [
+                'mongodump',
+                '--host', f"{{conn.host}}:{{conn.port}}",
+                '--db', conn.database,
+                f'--archive={{backup_file}}',
+                '--gzip'
+            ]
+            
+            # Add authentication if provided
+            cmd.extend(self._auth_args(conn))
+            
+            logger.info(f"Running mongodump for database {{conn.database}}")
+            returncode, stderr_tail = self.run_logged(cmd)
+            
+            if returncode != 0:
+                raise Exception(f"mongodump failed: {{stderr_tail}}")
+            
+            logger.info("MongoDB backup completed")
+            return backup_file
 
     def restore_backup(self, backup_file, target_config=None):
         """Restore MongoDB backup using mongorestore"""
-        conn = target_config or self.job_config['connection']
-        
-        # Extract backup archive to temporary directory
-        restore_dir = tempfile.mkdtemp(suffix='_mongodb_restore')
-        subprocess.run(['tar', '-xzf', backup_file, '-C', restore_dir])
-        
-        # Find the extracted database directory
-        extracted_dirs = os.listdir(restore_dir)
-        if not extracted_dirs:
-            raise Exception("No backup data found in archive")
-        
-        backup_path = os.path.join(restore_dir, extracted_dirs[0], conn['database'])
+        conn = target_config or self.job_config.connection
         
         # Build mongorestore command
         cmd = [
             'mongorestore',
-            '--host', f"{{conn['host']}}:{{conn['port']}}",
-            '--db', conn['database'],
-            '--gzip',
-            '--drop',
-            backup_path
+            '--host', f"{{conn.host}}:{{conn.port}}",
+            '--drop'
         ]
         
         # Add authentication if provided
-        if conn.get('username'):
-            cmd.extend(['--username', conn['username']])
-        if conn.get('password'):
-            cmd.extend(['--password', conn['password']])
-        if conn.get('authDatabase'):
-            cmd.extend(['--authenticationDatabase', conn['authDatabase']])
+        cmd.extend(self._auth_args(conn))
         
-        logger.info(f"Running mongorestore for database {{conn['database']}}")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        # Clean up temporary directory
-        subprocess.run(['rm', '-rf', restore_dir])
+        restore_dir = None
+        try:
+            if backup_file.endswith('.tar.gz'):
+                # Tarred dump directories from older runners
+                restore_dir = tempfile.mkdtemp(suffix='_mongodb_restore')
+                with tarfile.open(backup_file, 'r:gz') as tar:
+                    # Reject absolute paths and links out of restore_dir where tarfile supports it
+                    tar.extraction_filter = getattr(tarfile, 'data_filter', None)
+                    tar.extractall(restore_dir)
+                
+                # Find the extracted database directory
+                extracted_dirs = os.listdir(restore_dir)
+                if not extracted_dirs:
+                    raise Exception("No backup data found in archive")
+                
+                cmd.extend(['--gzip', '--db', conn.database, os.path.join(restore_dir, extracted_dirs[0], conn.database)])
+            elif backup_file.endswith('.archive.gz'):
+                # Whole-file gzipped archives from older runners, read from stdin
+                cmd.extend(['--archive', '--nsInclude', f"{{conn.database}}.*"])
+            else:
+                cmd.extend([f'--archive={{backup_file}}', '--gzip', '--nsInclude', f"{{conn.database}}.*"])
+            
+            logger.info(f"Running mongorestore for database {{conn.database}}")
+            if backup_file.endswith('.archive.gz'):
+                with subprocess.Popen(['gzip', '-dc', backup_file], stdout=subprocess.PIPE) as decompress_proc:
+                    returncode, stderr_tail = self.run_logged(cmd, stdin=decompress_proc.stdout)
+            else:
+                returncode, stderr_tail = self.run_logged(cmd)
+        finally:
+            # Clean up temporary directory
+            if restore_dir:
+                shutil.rmtree(restore_dir, ignore_errors=True)
         
-        if result.returncode != 0:
-            raise Exception(f"mongorestore failed: {{result.stderr}}")
+        if returncode != 0:
+            raise Exception(f"mongorestore failed: {{stderr_tail}}")
         
         logger.info("MongoDB restore completed")
         return True
-
-if __name__ == '__main__':
-    import sys
-    runner = MongoDBRunner()
-    
-    if len(sys.argv) > 1 and sys.argv[1] == 'restore':
-        if len(sys.argv) < 3:
-            print("Usage: python runner.py restore <backup_file>")
-            sys.exit(1)
-        runner.restore_backup(sys.argv[2])
-    else:
-        runner.run_backup()
 '''
 
 def create_redis_runner(db_path, version):
@@ -352,65 +375,67 @@ import redis
 
 # Add shared directory to path
 sys.path.append('/app')
-from backup_base import BackupRunnerBase
+from backup_base import BackupRunnerBase, cli_main
 
 logger = logging.getLogger(__name__)
 
 class RedisRunner(BackupRunnerBase):
     def create_backup(self):
         """Create Redis backup using BGSAVE"""
-        conn = self.job_config['connection']
+        conn = self.job_config.connection
         
         # Connect to Redis
         r = redis.Redis(
-            host=conn['host'],
-            port=conn['port'],
-            password=conn.get('password'),
-            db=conn.get('database', 0)
+            host=conn.host,
+            port=conn.port,
+            password=conn.password,
+            db=conn.database or 0
         )
         
         # Trigger background save
+        import time
+        before = r.lastsave()
         logger.info(f"Running Redis BGSAVE")
         r.bgsave()
         
-        # Wait for save to complete
-        import time
-        while r.lastsave() == r.lastsave():
-            time.sleep(1)
+        # Wait for save to complete: LASTSAVE moves past the value seen before BGSAVE
+        deadline = time.monotonic() + 300
+        while r.lastsave() == before:
+            if time.monotonic() > deadline:
+                raise Exception("Timed out waiting for Redis BGSAVE to complete")
+            time.sleep(0.05)
         
         # Create temporary backup file and copy RDB data
-        with tempfile.NamedTemporaryFile(mode='w+b', delete=False, suffix='.rdb') as f:
-            backup_file = f.name
-        
-        # Use redis-cli to get RDB dump
-        cmd = [
-            'redis-cli',
-            '--rdb', backup_file,
-            '-h', conn['host'],
-            '-p', str(conn['port'])
-        ]
-        
-        if conn.get('password'):
-            cmd.extend(['-a', conn['password']])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            raise Exception(f"Redis backup failed: {{result.stderr}}")
-        
-        logger.info("Redis backup completed")
-        return backup_file
+        with self.backup_tempfile('.rdb') as backup_file:
+            # Use redis-cli to get RDB dump
+            cmd = [
+                'redis-cli',
+                '--rdb', backup_file,
+                '-h', conn.host,
+                '-p', str(conn.port)
+            ]
+            
+            if conn.password:
+                cmd.extend(['-a', conn.password])
+            
+            returncode, stderr_tail = self.run_logged(cmd)
+            
+            if returncode != 0:
+                raise Exception(f"Redis backup failed: {{stderr_tail}}")
+            
+            logger.info("Redis backup completed")
+            return backup_file
 
     def restore_backup(self, backup_file, target_config=None):
         """Restore Redis backup by loading RDB file"""
-        conn = target_config or self.job_config['connection']
+        conn = target_config or self.job_config.connection
         
         # Connect to Redis
         r = redis.Redis(
-            host=conn['host'],
-            port=conn['port'],
-            password=conn.get('password'),
-            db=conn.get('database', 0)
+            host=conn.host,
+            port=conn.port,
+            password=conn.password,
+            db=conn.database or 0
         )
         
         # Flush existing data
@@ -420,50 +445,40 @@ class RedisRunner(BackupRunnerBase):
         cmd = [
             'redis-cli',
             '--pipe',
-            '-h', conn['host'],
-            '-p', str(conn['port'])
+            '-h', conn.host,
+            '-p', str(conn.port)
         ]
         
-        if conn.get('password'):
-            cmd.extend(['-a', conn['password']])
+        if conn.password:
+            cmd.extend(['-a', conn.password])
         
         with open(backup_file, 'rb') as f:
-            result = subprocess.run(cmd, stdin=f, capture_output=True)
+            returncode, stderr_tail = self.run_logged(cmd, stdin=f)
         
-        if result.returncode != 0:
-            raise Exception(f"Redis restore failed: {{result.stderr}}")
+        if returncode != 0:
+            raise Exception(f"Redis restore failed: {{stderr_tail}}")
         
         logger.info("Redis restore completed")
         return True
-
-if __name__ == '__main__':
-    import sys
-    runner = RedisRunner()
-    
-    if len(sys.argv) > 1 and sys.argv[1] == 'restore':
-        if len(sys.argv) < 3:
-            print("Usage: python runner.py restore <backup_file>")
-            sys.exit(1)
-        runner.restore_backup(sys.argv[2])
-    else:
-        runner.run_backup()
 '''
 
+# Host ports for test containers, offset from each database's default to avoid conflicts
+_DEFAULT_PORTS = types.MappingProxyType({
+    'postgresql': 5433,
+    'mysql': 3307,
+    'mariadb': 3308,
+    'mongodb': 27018,
+    'redis': 6380,
+    'mssql': 1434,
+    'oracle': 1522,
+    'cassandra': 9043,
+    'arangodb': 8530,
+    'couchbase': 8092
+})
+
 def _get_default_port(db_type):
     """Get default port for database type"""
-    ports = {
-        'postgresql': 5433,
-        'mysql': 3307,
-        'mariadb': 3308,
-        'mongodb': 27018,
-        'redis': 6380,
-        'mssql': 1434,
-        'oracle': 1522,
-        'cassandra': 9043,
-        'arangodb': 8530,
-        'couchbase': 8092
-    }
-    return ports.get(db_type, 9999)
+    return _DEFAULT_PORTS.get(db_type, 9999)
 
 def create_test_template(db_type, version, db_path):
     """Create a basic test template"""
@@ -542,10 +557,10 @@ class {db_type.title()}IntegrationTest:
                 '-f', './{db_path}/Dockerfile',
                 '-t', f'planb-backup-{db_type}-{version}-test',
                 '.'
-            ], capture_output=True, text=True, cwd='/Users/diablo/Projects/react/backup-runner')
+            ], capture_output=True, cwd='/Users/diablo/Projects/react/backup-runner')
             
             if build_result.returncode != 0:
-                raise Exception(f"Failed to build backup container: {{build_result.stderr}}")
+                raise Exception(f"Failed to build backup container: {{build_result.stderr.decode('utf-8', 'replace')}}")
             
             logger.info("✅ Backup container built successfully!")
             return True
@@ -604,30 +619,15 @@ if __name__ == '__main__':
     sys.exit(0 if success else 1)
 '''
 
+# Known database types, matched against whole path components
+DATABASE_TYPES = frozenset({
+    'postgresql', 'mysql', 'mariadb', 'mongodb', 'redis',
+    'mssql', 'oracle', 'cassandra', 'arangodb', 'couchbase'
+})
+
 def get_database_type(path):
     """Extract database type from path"""
-    if 'postgresql' in path:
-        return 'postgresql'
-    elif 'mysql' in path:
-        return 'mysql' 
-    elif 'mariadb' in path:
-        return 'mariadb'
-    elif 'mongodb' in path:
-        return 'mongodb'
-    elif 'redis' in path:
-        return 'redis'
-    elif 'mssql' in path:
-        return 'mssql'
-    elif 'oracle' in path:
-        return 'oracle'
-    elif 'cassandra' in path:
-        return 'cassandra'
-    elif 'arangodb' in path:
-        return 'arangodb'
-    elif 'couchbase' in path:
-        return 'couchbase'
-    else:
-        return 'unknown'
+    return next((part for part in Path(path).parts if part in DATABASE_TYPES), 'unknown')
 
 def get_version_from_path(path):
     """Extract version from path"""
@@ -635,6 +635,35 @@ def get_version_from_path(path):
 
 def create_runner_content(db_type, version, db_path):
     """Create appropriate runner content based on database type"""
+    # Runner templates don't depend on the path, so each (db_type, version) renders once
+    return _render_runner(db_type, version)
+
+# Class each runner template defines, for the command-line entry point appended to it
+_RUNNER_CLASSES = {
+    'postgresql': 'PostgreSQLRunner',
+    'mysql': 'MySQLRunner',
+    'mariadb': 'MySQLRunner',
+    'mongodb': 'MongoDBRunner',
+    'redis': 'RedisRunner'
+}
+
+@functools.lru_cache(maxsize=None)
+def _main_tail(runner_class):
+    """The `__main__` block shared by every runner, for one runner class"""
+    return f"""
+if __name__ == '__main__':
+    cli_main({runner_class})
+"""
+
+@functools.lru_cache(maxsize=None)
+def _render_runner(db_type, version):
+    """Render the runner template for a database type and version"""
+    runner_class = _RUNNER_CLASSES.get(db_type, f'{db_type.title()}Runner')
+    return _render_body(db_type, version) + _main_tail(runner_class)
+
+def _render_body(db_type, version):
+    """Render a runner template up to its `__main__` block"""
+    db_path = None  # Accepted by the create_*_runner templates but never interpolated
     if db_type == 'postgresql':
         return create_postgresql_runner(db_path, version)
     elif db_type in ['mysql', 'mariadb']:
@@ -659,7 +688,7 @@ import logging
 
 # Add shared directory to path
 sys.path.append('/app')
-from backup_base import BackupRunnerBase
+from backup_base import BackupRunnerBase, cli_main
 
 logger = logging.getLogger(__name__)
 
@@ -673,67 +702,71 @@ class {db_type.title()}Runner(BackupRunnerBase):
         """Restore backup using {db_type} tools"""
         # TODO: Implement {db_type} restore functionality
         raise NotImplementedError("Restore functionality not yet implemented for {db_type}")
+'''
 
-if __name__ == '__main__':
-    import sys
-    runner = {db_type.title()}Runner()
+def _unchanged(path, data):
+    """Whether path is already an executable file holding exactly data"""
+    try:
+        st = os.stat(path)
+        # Size and mode rule out most changed files without reading them
+        if st.st_size != len(data) or not st.st_mode & 0o111:
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except FileNotFoundError:
+        return False
+
+def _write_executable(path, content):
+    """Write a generated script with unbuffered writes and make it executable"""
+    data = content.encode()
+    if _unchanged(path, data):
+        return
     
-    if len(sys.argv) > 1 and sys.argv[1] == 'restore':
-        if len(sys.argv) < 3:
-            print("Usage: python runner.py restore <backup_file>")
-            sys.exit(1)
-        runner.restore_backup(sys.argv[2])
-    else:
-        runner.run_backup()
-'''
+    # os.open's mode only applies when it creates the file; fchmod fixes existing non-executable ones
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    try:
+        os.fchmod(fd, 0o755)
+        data = memoryview(data)
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+def _emit(db_path):
+    """Generate runner.py and test.py for one database version directory"""
+    db_type = get_database_type(db_path)
+    version = get_version_from_path(db_path)
+    
+    # Create runner.py
+    runner_file = os.path.join(db_path, 'runner.py')
+    runner_content = create_runner_content(db_type, version, db_path)
+    _write_executable(runner_file, runner_content)
+    
+    # Create test.py
+    test_file = os.path.join(db_path, 'test.py')
+    test_content = create_test_template(db_type, version, db_path)
+    _write_executable(test_file, test_content)
+    
+    print(f"✅ Created runner.py and test.py for {db_type} {version} ({db_path})")
+    return db_type, [runner_file, test_file]
 
 def main():
     """Generate runner.py and test.py files for all database versions"""
     print("🚀 Creating runner.py and test.py files for all databases...")
     
     db_directories = get_database_directories()
-    created_files = []
     
-    for db_path in db_directories:
-        db_type = get_database_type(db_path)
-        version = get_version_from_path(db_path)
-        
-        print(f"\n📦 Processing {db_type} {version} ({db_path})")
-        
-        # Create runner.py
-        runner_file = os.path.join(db_path, 'runner.py')
-        runner_content = create_runner_content(db_type, version, db_path)
-        
-        with open(runner_file, 'w') as f:
-            f.write(runner_content)
-        
-        # Make executable
-        os.chmod(runner_file, 0o755)
-        created_files.append(runner_file)
-        
-        # Create test.py
-        test_file = os.path.join(db_path, 'test.py')
-        test_content = create_test_template(db_type, version, db_path)
-        
-        with open(test_file, 'w') as f:
-            f.write(test_content)
-        
-        # Make executable
-        os.chmod(test_file, 0o755)
-        created_files.append(test_file)
-        
-        print(f"✅ Created runner.py and test.py for {db_type} {version}")
+    # Directories are independent, so generate them concurrently
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, len(db_directories) or 1)) as executor:
+        results = list(executor.map(_emit, db_directories))
+    
+    created_files = [path for _, files in results for path in files]
     
     print(f"\n🎉 Successfully created {len(created_files)} files!")
     print(f"📊 Generated for {len(db_directories)} database versions")
     
     # Summary
-    db_summary = {}
-    for db_path in db_directories:
-        db_type = get_database_type(db_path)
-        if db_type not in db_summary:
-            db_summary[db_type] = 0
-        db_summary[db_type] += 1
+    db_summary = collections.Counter(db_type for db_type, _ in results)
     
     print("\\n📋 Summary:")
     for db_type, count in sorted(db_summary.items()):
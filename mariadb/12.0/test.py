@@ -7,27 +7,38 @@ Tests backup, compression, and S3 upload functionality
 import os
 import sys
 import time
+import socket
 import logging
 import subprocess
 import tempfile
+import urllib.request
+import threading
+import concurrent.futures
 import docker
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
 logger = logging.getLogger(__name__)
 
+# The database container, its data volume and the network outlive a run, so later runs skip MariaDB's cold start
+DB_CONTAINER_NAME = "planb_test_mariadb_120"
+DB_VOLUME_NAME = "planb_test_mariadb_120_data"
+TEST_NETWORK_NAME = "planb_test_network_120"
+
 class MariaDBIntegrationTest120:
-    def __init__(self):
+    def __init__(self, fresh=False):
         """Initialize MariaDB 12.0 integration test"""
         self.client = docker.from_env()
+        self.fresh = fresh
         self.db_port = 3306 + int(time.time()) % 1000
         self.test_db = "planb_testdb"
         self.mariadb_user = "testuser"
         self.mariadb_password = "testpass123"
         self.container = None
-        self.container_name = f"planb_test_mariadb_120_{int(time.time())}"
+        self.container_name = DB_CONTAINER_NAME
         self.test_network = None
         
         # MinIO S3-compatible storage for testing
@@ -37,55 +48,69 @@ class MariaDBIntegrationTest120:
         self.minio_access_key = "minioadmin"
         self.minio_secret_key = "minioadmin"
         self.minio_bucket = "test-backups"
+        self.backup_key = f"{self.test_db}_backup.sql.gz"
+        self.mydumper_backup_key = f"{self.test_db}_backup.mydumper.tar.gz"
+        self._s3 = None
+
+    @property
+    def s3(self):
+        """S3 client for the MinIO container, built once and reused"""
+        if self._s3 is None:
+            self._s3 = boto3.client(
+                's3',
+                endpoint_url=f'http://localhost:{self.minio_port}',
+                aws_access_key_id=self.minio_access_key,
+                aws_secret_access_key=self.minio_secret_key,
+                config=Config(
+                    max_pool_connections=32,
+                    retries={'mode': 'adaptive', 'max_attempts': 5},
+                    tcp_keepalive=True
+                )
+            )
+        return self._s3
 
-    def start_database_container(self):
-        """Start MariaDB 12.0 container for testing"""
+    def ensure_database_container(self):
+        """Reuse the MariaDB 12.0 test container from an earlier run, or start one"""
         logger.info("🐬 Starting MariaDB 12.0 container...")
         
         try:
-            # Create a custom network for test containers
-            network_name = f"planb_test_network_{int(time.time())}"
-            self.test_network = self.client.networks.create(network_name, driver="bridge")
+            if self.fresh:
+                self._remove_database_container()
             
-            # Start MariaDB container on custom network
-            self.container = self.client.containers.run(
-                "mariadb:12.0",
-                environment={
-                    "MARIADB_ROOT_PASSWORD": self.mariadb_password,
-                    "MARIADB_DATABASE": self.test_db,
-                    "MARIADB_USER": self.mariadb_user,
-                    "MARIADB_PASSWORD": self.mariadb_password,
-                },
-                ports={'3306/tcp': self.db_port},
-                detach=True,
-                remove=True,
-                name=self.container_name,
-                network=network_name  # Connect to custom network
-            )
-            logger.info(f"✅ MariaDB container '{self.container_name}' started on port {self.db_port}")
+            # Custom network shared by the test containers
+            try:
+                self.test_network = self.client.networks.get(TEST_NETWORK_NAME)
+            except docker.errors.NotFound:
+                self.test_network = self.client.networks.create(TEST_NETWORK_NAME, driver="bridge")
+            
+            self.container = self._reuse_database_container()
+            if self.container is None:
+                # Start MariaDB container on custom network, keeping its data in a named volume
+                self.container = self.client.containers.run(
+                    "mariadb:12.0",
+                    environment={
+                        "MARIADB_ROOT_PASSWORD": self.mariadb_password,
+                        "MARIADB_DATABASE": self.test_db,
+                        "MARIADB_USER": self.mariadb_user,
+                        "MARIADB_PASSWORD": self.mariadb_password,
+                    },
+                    ports={'3306/tcp': self.db_port},
+                    volumes={DB_VOLUME_NAME: {'bind': '/var/lib/mysql', 'mode': 'rw'}},
+                    detach=True,
+                    name=self.container_name,
+                    network=self.test_network.name  # Connect to custom network
+                )
+                logger.info(f"✅ MariaDB container '{self.container_name}' started on port {self.db_port}")
             
             # Wait for MariaDB to be ready
             logger.info("⏳ Waiting for MariaDB to be ready...")
-            max_attempts = 30  # Reduced timeout for faster feedback
+            max_attempts = 150  # 0.2s apart, so about 30s
             for attempt in range(max_attempts):
-                try:
-                    # Test MariaDB connection using mariadb client
-                    result = subprocess.run([
-                        'docker', 'exec', self.container_name,
-                        'mariadb', '-u', self.mariadb_user, f'-p{self.mariadb_password}', '-e', 'SELECT 1;'
-                    ], capture_output=True, text=True, timeout=5)
-                    if result.returncode == 0:
-                        logger.info("✅ MariaDB is ready!")
-                        break
-                    else:
-                        logger.info(f"Attempt {attempt + 1}: MariaDB not ready yet (return code: {result.returncode})")
-                        if result.stderr:
-                            logger.info(f"Error: {result.stderr}")
-                except subprocess.TimeoutExpired:
-                    logger.info(f"Attempt {attempt + 1}: Connection timeout")
-                except Exception as e:
-                    logger.info(f"Attempt {attempt + 1}: Exception: {e}")
-                time.sleep(1)  # Reduced sleep time
+                # Probe the published port directly; each docker exec costs far more than the check itself
+                if self._server_handshake_ready():
+                    logger.info("✅ MariaDB is ready!")
+                    break
+                time.sleep(0.2)
                 if attempt == max_attempts - 1:
                     raise Exception("MariaDB failed to start within timeout")
             
@@ -95,28 +120,69 @@ class MariaDBIntegrationTest120:
             logger.error(f"❌ Failed to start MariaDB container: {e}")
             return False
 
+    def _reuse_database_container(self):
+        """Return the test container left by an earlier run, started and with its published port, if any"""
+        try:
+            container = self.client.containers.get(self.container_name)
+        except docker.errors.NotFound:
+            return None
+        
+        if container.status != 'running':
+            container.start()
+            container.reload()
+        self.db_port = int(container.ports['3306/tcp'][0]['HostPort'])
+        logger.info(f"♻️  Reusing MariaDB container '{self.container_name}' on port {self.db_port}")
+        return container
+
+    def _remove_database_container(self):
+        """Remove the kept test container and its data volume, for a from-scratch run"""
+        logger.info("🧹 Removing kept MariaDB container and data volume (--fresh)...")
+        try:
+            self.client.containers.get(self.container_name).remove(force=True)
+        except docker.errors.NotFound:
+            pass
+        try:
+            self.client.volumes.get(DB_VOLUME_NAME).remove(force=True)
+        except docker.errors.NotFound:
+            pass
+
+    def _server_handshake_ready(self):
+        """Whether the published port answers with a MySQL-protocol server greeting"""
+        try:
+            with socket.create_connection(('127.0.0.1', self.db_port), timeout=0.5) as sock:
+                # 3-byte payload length and sequence id, then protocol version 10; docker-proxy accepts
+                # connections before the server listens, so an open port alone proves nothing
+                header = sock.recv(5)
+                return len(header) == 5 and header[4] == 10
+        except OSError:
+            return False
+
     def setup_test_data(self):
         """Setup test data in MariaDB"""
         logger.info("📊 Setting up test data...")
         
         try:
-            # Create test tables and insert sample data
+            # Start from an empty database, since the container may hold data from an earlier run
             setup_commands = [
-                f"USE {self.test_db}; CREATE TABLE IF NOT EXISTS movies (id INT PRIMARY KEY, title VARCHAR(255), year INT);",
-                f"USE {self.test_db}; CREATE TABLE IF NOT EXISTS actors (id INT PRIMARY KEY, name VARCHAR(255), movie_id INT);",
-                f"USE {self.test_db}; INSERT INTO movies (id, title, year) VALUES (1, 'The Matrix', 1999), (2, 'Inception', 2010);",
-                f"USE {self.test_db}; INSERT INTO actors (id, name, movie_id) VALUES (1, 'Keanu Reeves', 1), (2, 'Leonardo DiCaprio', 2);",
-                f"USE {self.test_db}; INSERT INTO actors (id, name, movie_id) VALUES (1, 'Keanu Reeves', 1), (2, 'Leonardo DiCaprio', 2);"
+                f"DROP DATABASE IF EXISTS {self.test_db};",
+                f"CREATE DATABASE {self.test_db};",
+                f"USE {self.test_db};",
+                "CREATE TABLE IF NOT EXISTS movies (id INT PRIMARY KEY, title VARCHAR(255), year INT);",
+                "CREATE TABLE IF NOT EXISTS actors (id INT PRIMARY KEY, name VARCHAR(255), movie_id INT);",
+                "INSERT INTO movies (id, title, year) VALUES (1, 'The Matrix', 1999), (2, 'Inception', 2010);",
+                "INSERT INTO actors (id, name, movie_id) VALUES (1, 'Keanu Reeves', 1), (2, 'Leonardo DiCaprio', 2);"
             ]
             
-            for cmd in setup_commands:
-                result = subprocess.run([
-                    'docker', 'exec', self.container_name,
-                    'mariadb', '-u', self.mariadb_user, f'-p{self.mariadb_password}', '-e', cmd
-                ], capture_output=True, text=True, timeout=10)
-                
-                if result.returncode != 0:
-                    logger.warning(f"Command failed: {cmd}, Error: {result.stderr}")
+            # One client session reads the whole script from stdin instead of a docker exec per statement;
+            # `-e MYSQL_PWD` copies the password from our environment, keeping it off both command lines
+            result = subprocess.run([
+                'docker', 'exec', '-i', '-e', 'MYSQL_PWD', self.container_name,
+                'mariadb', '-u', self.mariadb_user, self.test_db
+            ], input='\n'.join(setup_commands), capture_output=True, text=True, timeout=30,
+                env={**os.environ, 'MYSQL_PWD': self.mariadb_password})
+            
+            if result.returncode != 0:
+                logger.warning(f"Test data setup failed: {result.stderr}")
             
             logger.info("✅ Test data setup complete")
             return True
@@ -147,9 +213,16 @@ class MariaDBIntegrationTest120:
             
             logger.info(f"✅ MinIO container '{self.minio_container_name}' started on port {self.minio_port}")
             
-            # Wait for MinIO to be ready
+            # Wait for MinIO to be ready; it usually reports ready well within a second
             logger.info("⏳ Waiting for MinIO to be ready...")
-            time.sleep(10)  # Give MinIO time to start
+            max_attempts = 100  # 0.2s apart, so about 20s
+            for attempt in range(max_attempts):
+                if self._minio_ready():
+                    logger.info("✅ MinIO is ready!")
+                    break
+                time.sleep(0.2)
+                if attempt == max_attempts - 1:
+                    raise Exception("MinIO failed to start within timeout")
             
             # Create test bucket
             self._create_minio_bucket()
@@ -160,16 +233,19 @@ class MariaDBIntegrationTest120:
             logger.error(f"❌ Failed to start MinIO container: {e}")
             return False
 
+    def _minio_ready(self):
+        """Whether MinIO's readiness endpoint answers 200 on the published port"""
+        try:
+            with urllib.request.urlopen(f'http://localhost:{self.minio_port}/minio/health/ready', timeout=0.5) as response:
+                return response.status == 200
+        except OSError:
+            # Covers refused/reset connections and non-2xx answers (HTTPError is an OSError too)
+            return False
+
     def _create_minio_bucket(self):
         """Create test bucket in MinIO"""
         try:
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=f'http://localhost:{self.minio_port}',
-                aws_access_key_id=self.minio_access_key,
-                aws_secret_access_key=self.minio_secret_key
-            )
-            s3_client.create_bucket(Bucket=self.minio_bucket)
+            self.s3.create_bucket(Bucket=self.minio_bucket)
             logger.info(f"✅ Created MinIO bucket: {self.minio_bucket}")
         except Exception as e:
             logger.warning(f"⚠️  Failed to create MinIO bucket: {e}")
@@ -179,13 +255,22 @@ class MariaDBIntegrationTest120:
         logger.info("🔨 Building MariaDB 12.0 backup container...")
         
         try:
-            # Build the container
-            image, build_logs = self.client.images.build(
-                path="/Users/diablo/Projects/react/backup-runner/mariadb/12.0",
-                dockerfile="Dockerfile",
-                tag="gcr.io/apito-cms/plan-b-backup-mariadb:test-120",
-                rm=True
-            )
+            # Build once for linux/amd64 (Cloud Run requirement), so the same image is tested and pushed.
+            # BuildKit (docker-py only drives the legacy builder) embeds its layer cache in the image, so the
+            # last pushed :12.0 seeds the cache for cold rebuilds on any host
+            result = subprocess.run([
+                'docker', 'buildx', 'build',
+                '--platform', 'linux/amd64',
+                '--cache-from', 'type=registry,ref=gcr.io/apito-cms/plan-b-backup-mariadb:12.0',
+                '--cache-to', 'type=inline',
+                '--load',
+                '-t', 'gcr.io/apito-cms/plan-b-backup-mariadb:test-120',
+                '-t', 'gcr.io/apito-cms/plan-b-backup-mariadb:12.0',
+                '/Users/diablo/Projects/react/backup-runner/mariadb/12.0'
+            ], capture_output=True, text=True, env={**os.environ, 'DOCKER_BUILDKIT': '1'})
+            
+            if result.returncode != 0:
+                raise Exception(result.stderr)
             
             logger.info("✅ MariaDB 12.0 backup container built successfully")
             return True
@@ -194,40 +279,60 @@ class MariaDBIntegrationTest120:
             logger.error(f"❌ Failed to build MariaDB container: {e}")
             return False
 
-    def run_backup_test(self):
-        """Run the backup test using the built container"""
-        logger.info("🧪 Running MariaDB 12.0 backup test...")
+    def run_backup_test(self, backup_tool='mariadb-dump'):
+        """Run the backup test using the built container and the given BACKUP_TOOL"""
+        logger.info(f"🧪 Running MariaDB 12.0 backup test with {backup_tool}...")
+        backup_key = self.mydumper_backup_key if backup_tool == 'mydumper' else self.backup_key
         
         try:
             # Run the backup container
             backup_container = self.client.containers.run(
                 "gcr.io/apito-cms/plan-b-backup-mariadb:test-120",
                 command=["python3", "/usr/local/bin/runner.py"],
+                # On the test bridge network the runner reaches MariaDB and MinIO by container name, not via published ports
                 environment={
-                    'DB_HOST': 'host.docker.internal',
-                    'DB_PORT': str(self.db_port),
+                    'DB_HOST': self.container_name,
+                    'DB_PORT': '3306',
                     'DB_NAME': self.test_db,
                     'DB_USERNAME': self.mariadb_user,
                     'DB_PASSWORD': self.mariadb_password,
-                    'STORAGE_ENDPOINT': f'http://host.docker.internal:{self.minio_port}',
+                    'STORAGE_ENDPOINT': f'http://{self.minio_container_name}:9000',
                     'STORAGE_BUCKET': self.minio_bucket,
                     'STORAGE_ACCESS_KEY_ID': self.minio_access_key,
                     'STORAGE_SECRET_ACCESS_KEY': self.minio_secret_key,
-                    'BACKUP_PATH': f'{self.test_db}_backup.sql.gz'
+                    'BACKUP_PATH': backup_key,
+                    'BACKUP_TOOL': backup_tool
                 },
                 detach=True,
-                remove=True,
-                network_mode="host"
+                network=self.test_network.name
             )
             
-            # Wait for backup to complete
-            result = backup_container.wait(timeout=300)
+            # Follow the runner's output live; the stream ends when it exits, or when the watchdog kills it
+            watchdog = threading.Timer(300, backup_container.kill)
+            watchdog.start()
+            output = []
+            try:
+                for chunk in backup_container.logs(stream=True, follow=True):
+                    line = chunk.decode('utf-8', 'replace').rstrip()
+                    output.append(line)
+                    logger.info(f"[runner] {line}")
+            finally:
+                watchdog.cancel()
+            
+            # Not auto-removed, so the exit code is still there to read once the stream ends
+            result = backup_container.wait(timeout=30)
+            backup_container.remove()
             
             if result['StatusCode'] == 0:
-                logger.info("✅ MariaDB 12.0 backup test completed successfully")
+                # A silent fallback to mariadb-dump would leave the mydumper path untested
+                if backup_tool == 'mydumper' and not any('Running mydumper' in line for line in output):
+                    logger.error("❌ Runner fell back to mariadb-dump instead of running mydumper")
+                    return False
+                
+                logger.info(f"✅ MariaDB 12.0 backup test with {backup_tool} completed successfully")
                 
                 # Verify backup was uploaded to MinIO
-                self._verify_backup_in_minio()
+                self._verify_backup_in_minio(backup_key)
                 return True
             else:
                 logger.error(f"❌ MariaDB backup test failed with exit code: {result['StatusCode']}")
@@ -237,24 +342,16 @@ class MariaDBIntegrationTest120:
             logger.error(f"❌ Failed to run MariaDB backup test: {e}")
             return False
 
-    def _verify_backup_in_minio(self):
+    def _verify_backup_in_minio(self, backup_key):
         """Verify backup was uploaded to MinIO"""
         try:
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=f'http://localhost:{self.minio_port}',
-                aws_access_key_id=self.minio_access_key,
-                aws_secret_access_key=self.minio_secret_key
-            )
+            # Look up just the key the runner was given, rather than paging through the whole bucket
+            response = self.s3.list_objects_v2(Bucket=self.minio_bucket, Prefix=backup_key, MaxKeys=1)
             
-            # List objects in bucket
-            response = s3_client.list_objects_v2(Bucket=self.minio_bucket)
-            
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    if obj['Key'].endswith('.sql.gz'):
-                        logger.info(f"✅ Backup verified in MinIO: {obj['Key']} ({obj['Size']} bytes)")
-                        return True
+            for obj in response.get('Contents', []):
+                if obj['Key'] == backup_key:
+                    logger.info(f"✅ Backup verified in MinIO: {obj['Key']} ({obj['Size']} bytes)")
+                    return True
             
             logger.warning("⚠️  No backup files found in MinIO")
             return False
@@ -268,23 +365,16 @@ class MariaDBIntegrationTest120:
         logger.info("🚀 Pushing MariaDB 12.0 container to GCR...")
         
         try:
-            # Build for linux/amd64 platform (Cloud Run requirement)
-            image, build_logs = self.client.images.build(
-                path="/Users/diablo/Projects/react/backup-runner/mariadb/12.0",
-                dockerfile="Dockerfile",
-                tag="gcr.io/apito-cms/plan-b-backup-mariadb:12.0",
-                platform="linux/amd64",
-                rm=True
-            )
-            
-            # Push to GCR
+            # Push the image build_container already built and tagged; progress repeats each status, so log changes only
+            last_status = None
             for line in self.client.images.push(
                 "gcr.io/apito-cms/plan-b-backup-mariadb:12.0",
                 stream=True,
                 decode=True
             ):
-                if 'status' in line:
-                    logger.info(f"Push status: {line['status']}")
+                if 'status' in line and line['status'] != last_status:
+                    last_status = line['status']
+                    logger.info(f"Push status: {last_status}")
             
             logger.info("✅ MariaDB 12.0 container pushed to GCR successfully")
             return True
@@ -298,13 +388,11 @@ class MariaDBIntegrationTest120:
         logger.info("🧹 Cleaning up...")
         
         try:
-            if self.container:
-                self.container.stop()
             if self.minio_container:
                 self.minio_container.stop()
-            if self.test_network:
-                self.test_network.remove()
-            logger.info("✅ Test network removed")
+            # The MariaDB container and its network stay up for the next run; --fresh resets them
+            if self.container:
+                logger.info(f"♻️  Kept MariaDB container '{self.container_name}' for reuse")
         except Exception as e:
             logger.warning(f"⚠️  Cleanup warning: {e}")
 
@@ -314,31 +402,42 @@ class MariaDBIntegrationTest120:
         logger.info("=" * 60)
         
         try:
-            # Step 1: Start test database
-            logger.info("📋 Step 1: Starting test database...")
-            if not self.start_database_container():
-                return False
-            
-            # Step 2: Setup test data
-            logger.info("📋 Step 2: Setting up test data...")
-            if not self.setup_test_data():
-                return False
-            
-            # Step 3: Start MinIO
-            logger.info("📋 Step 3: Starting MinIO...")
-            if not self.start_minio_container():
-                return False
-            
-            # Step 4: Build container
-            logger.info("📋 Step 4: Building backup container...")
-            if not self.build_container():
-                return False
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+                # Step 4: Build container; the image build is independent of the test containers, so it overlaps steps 1-3
+                logger.info("📋 Step 4: Building backup container in the background...")
+                build_future = executor.submit(self.build_container)
+                
+                # Step 1: Start test database
+                logger.info("📋 Step 1: Starting test database...")
+                if not self.ensure_database_container():
+                    return False
+                
+                # Step 2: Setup test data
+                logger.info("📋 Step 2: Setting up test data...")
+                if not self.setup_test_data():
+                    return False
+                
+                # Step 3: Start MinIO
+                logger.info("📋 Step 3: Starting MinIO...")
+                if not self.start_minio_container():
+                    return False
+                
+                logger.info("📋 Step 4: Waiting for backup container build...")
+                if not build_future.result():
+                    return False
             
             # Step 5: Run backup test
             logger.info("📋 Step 5: Running backup test...")
             if not self.run_backup_test():
                 return False
             
+            # Step 5b: Run backup test through the opt-in parallel mydumper path. testuser only has
+            # MARIADB_USER's grants on the test database, so no RELOAD: the runner locks with LOCK TABLES
+            # rather than mydumper's default FTWRL/BACKUP STAGE
+            logger.info("📋 Step 5b: Running mydumper backup test...")
+            if not self.run_backup_test(backup_tool='mydumper'):
+                return False
+            
             # Step 6: Push to GCR
             logger.info("📋 Step 6: Pushing to GCR...")
             if not self.push_to_gcr():
@@ -354,6 +453,6 @@ class MariaDBIntegrationTest120:
             self.cleanup()
 
 if __name__ == '__main__':
-    test = MariaDBIntegrationTest120()
+    test = MariaDBIntegrationTest120(fresh='--fresh' in sys.argv[1:])
     success = test.run_full_test()
     sys.exit(0 if success else 1)
@@ -7,20 +7,50 @@ Backup, compression, and S3 upload functionality using official MariaDB tools
 import os
 import sys
 import subprocess
+import shutil
+import re
 import tempfile
 import logging
-import gzip
+import fcntl
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
-from datetime import datetime
+from datetime import datetime, timezone
 import tarfile
 import io
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
 logger = logging.getLogger(__name__)
 
+# Default pipes hold 64KiB; 1MiB (the unprivileged maximum) cuts wakeups between dump, compressor and uploader
+PIPE_BUFFER_SIZE = 1024 * 1024
+
+# Streamed uploads can't know their size up front; 16MiB parts allow dumps up to ~156GiB under S3's 10,000-part cap
+STREAM_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True
+)
+
+# Backup codecs (BACKUP_COMPRESSION); gzip output stays readable by plain gunzip
+BACKUP_CODECS = ('gzip', 'zstd')
+
+# Dump tools (BACKUP_TOOL); mydumper dumps tables over parallel connections into a directory that is then tarred
+BACKUP_TOOLS = ('mariadb-dump', 'mydumper')
+
+# Parallel mydumper connections
+DUMP_THREADS = min(8, len(os.sched_getaffinity(0)))
+
+# mydumper options that lock with LOCK TABLES instead of FTWRL/BACKUP STAGE (which need RELOAD), oldest spelling first;
+# --trx-consistency-only still takes FTWRL briefly to line up the threads' snapshots
+MYDUMPER_LOCK_OPTIONS = ('--lock-all-tables', '--sync-thread-lock-mode=LOCK_ALL')
+
 class MariaDBRunner:
     def __init__(self):
         """Initialize MariaDB runner with environment variables"""
@@ -47,6 +77,9 @@ class MariaDBRunner:
         self.retention_days = os.getenv('RETENTION_DAYS', '30')
         self.callback_url = os.getenv('CALLBACK_URL')
         self.callback_secret = os.getenv('CALLBACK_SECRET')
+        self._http = self._init_http_session()
+        self.backup_compression = os.getenv('BACKUP_COMPRESSION', 'gzip').lower()
+        self.backup_tool = os.getenv('BACKUP_TOOL', 'mariadb-dump').lower()
 
         logger.info("🔧 Environment variables loaded")
 
@@ -56,6 +89,22 @@ class MariaDBRunner:
         # Initialize S3 client
         self._init_s3_client()
 
+    def _init_http_session(self):
+        """Pooled session for callbacks, retrying transient failures with backoff"""
+        # Callbacks report the same job state each time, so retrying the POST is safe
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            respect_retry_after_header=True,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'POST'})
+        )
+        adapter = HTTPAdapter(max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
     def _validate_environment(self):
         """Validate required environment variables"""
         required_vars = [
@@ -67,6 +116,12 @@ class MariaDBRunner:
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
+        if self.backup_compression not in BACKUP_CODECS:
+            raise ValueError(f"Unsupported BACKUP_COMPRESSION: {self.backup_compression}")
+
+        if self.backup_tool not in BACKUP_TOOLS:
+            raise ValueError(f"Unsupported BACKUP_TOOL: {self.backup_tool}")
+
     def _init_s3_client(self):
         """Initialize S3 client with credentials"""
         try:
@@ -88,6 +143,14 @@ class MariaDBRunner:
                 region_name=self.storage_region
             )
 
+            # Fixed client settings skip auto-detection at startup; path-style addressing suits MinIO-style endpoints
+            client_config = Config(
+                signature_version='s3v4',
+                s3={'addressing_style': 'path'},
+                defaults_mode='standard',
+                retries={'mode': 'adaptive'}
+            )
+
             # For S3-compatible storage (like MinIO), use custom endpoint
             if self.storage_endpoint and not self.storage_endpoint.startswith('https://s3.'):
                 # Determine SSL usage based on endpoint
@@ -96,45 +159,38 @@ class MariaDBRunner:
                 self.s3_client = session.client(
                     's3',
                     endpoint_url=self.storage_endpoint,
-                    use_ssl=use_ssl
+                    use_ssl=use_ssl,
+                    config=client_config
                 )
             else:
                 # Standard AWS S3
                 logger.info("🔧 Using standard AWS S3")
-                self.s3_client = session.client('s3')
+                self.s3_client = session.client('s3', config=client_config)
 
+            # No connectivity probe: the upload is the first request and reports the same errors
             logger.info(f"✅ S3 client initialized for endpoint: {self.storage_endpoint}")
 
-            # Test connectivity
-            try:
-                logger.info("🔧 Testing S3 connectivity...")
-                self.s3_client.list_buckets()
-                logger.info("✅ S3 connectivity test successful")
-            except Exception as conn_error:
-                logger.warning(f"⚠️  S3 connectivity test failed: {conn_error}")
-                # Don't fail here, just warn - the endpoint might be valid but not accessible yet
-
         except Exception as e:
             logger.error(f"❌ Failed to initialize S3 client: {e}")
             raise
 
     def create_backup(self):
-        """Create MariaDB backup using mariadb-dump"""
+        """Create MariaDB backup by streaming mariadb-dump through a compressor to S3"""
         logger.info(f"🐬 Creating MariaDB backup for database: {self.db_name}")
 
         with tempfile.TemporaryDirectory() as temp_dir:
-            backup_file_name = f"{self.db_name}_backup.sql"
-            backup_file_path = os.path.join(temp_dir, backup_file_name)
-
             try:
+                defaults_file = self._write_client_defaults(temp_dir)
+
                 # Construct mariadb-dump command
                 mariadb_dump_cmd = [
                     "mariadb-dump",
+                    f"--defaults-extra-file={defaults_file}",
                     f"--host={self.db_host}",
                     f"--port={self.db_port}",
                     f"--user={self.db_username}",
-                    f"--password={self.db_password}",
                     "--single-transaction",
+                    "--compress",  # zlib on the wire from the server; the dump is recompressed once for storage
                     "--routines",
                     "--triggers",
                     "--events",
@@ -142,32 +198,49 @@ class MariaDBRunner:
                     self.db_name
                 ]
 
-                logger.info(f"▶️  Running mariadb-dump command: {' '.join(mariadb_dump_cmd[:-1])} {self.db_name}")
-                with open(backup_file_path, 'w') as f:
-                    result = subprocess.run(mariadb_dump_cmd, stdout=f, stderr=subprocess.PIPE, text=True)
-                
-                if result.returncode != 0:
-                    raise Exception(f"mariadb-dump failed: {result.stderr}")
-                
-                logger.info("✅ MariaDB backup created successfully locally.")
-
-                # Compress the backup file
-                compressed_file_path = os.path.join(temp_dir, os.path.basename(self.backup_path))
-                logger.info(f"🗜️  Compressing backup to {compressed_file_path}...")
-                with open(backup_file_path, 'rb') as f_in:
-                    with gzip.open(compressed_file_path, 'wb') as f_out:
-                        f_out.writelines(f_in)
-                logger.info("✅ Backup compressed successfully.")
-
-                # Upload to S3
-                self._upload_to_s3(compressed_file_path)
+                dump_dir = os.path.join(temp_dir, 'dump')
+                mydumper_cmd = self._mydumper_command(dump_dir) if self.backup_tool == 'mydumper' else None
+                if mydumper_cmd:
+                    dump_cmd = self._run_mydumper(mydumper_cmd, dump_dir)
+                else:
+                    if self.backup_tool == 'mydumper':
+                        logger.warning("⚠️  mydumper unavailable or too old, falling back to mariadb-dump")
+                    dump_cmd = mariadb_dump_cmd
+                    logger.info(f"▶️  Running mariadb-dump command: {' '.join(mariadb_dump_cmd[:-1])} {self.db_name}")
+
+                compress_cmd = self._compress_command()
+                compressor = compress_cmd[0]
+
+                logger.info(f"🗜️  Streaming {compressor} output to s3://{self.storage_bucket}/{self.backup_path}...")
+
+                # mariadb-dump (or tar, for mydumper) writes into the compressor, which feeds the multipart upload
+                with tempfile.TemporaryFile() as dump_log:
+                    dump_proc = subprocess.Popen(dump_cmd, stdout=subprocess.PIPE, stderr=dump_log)
+                    self._grow_pipe_buffer(dump_proc.stdout)
+                    compress_proc = subprocess.Popen(compress_cmd, stdin=dump_proc.stdout, stdout=subprocess.PIPE)
+                    self._grow_pipe_buffer(compress_proc.stdout)
+                    # Only the compressor should hold the read end, so it sees EOF/SIGPIPE correctly
+                    dump_proc.stdout.close()
+
+                    try:
+                        self._upload_to_s3(compress_proc.stdout)
+                    finally:
+                        compress_proc.stdout.close()
+                        compress_returncode = compress_proc.wait()
+                        dump_returncode = dump_proc.wait()
+
+                    if dump_returncode != 0 or compress_returncode != 0:
+                        # Don't leave a truncated dump behind looking like a good backup
+                        self.s3_client.delete_object(Bucket=self.storage_bucket, Key=self.backup_path)
+                    if dump_returncode != 0:
+                        dump_log.seek(0)
+                        raise Exception(f"{dump_cmd[0]} failed: {dump_log.read().decode('utf-8', 'replace')}")
+                if compress_returncode != 0:
+                    raise Exception(f"{compressor} failed with exit code {compress_returncode}")
 
                 logger.info("🎉 MariaDB backup, compression, and upload complete!")
                 return True
 
-            except subprocess.CalledProcessError as e:
-                logger.error(f"❌ mariadb-dump failed: {e.stderr}")
-                raise
             except ClientError as e:
                 logger.error(f"❌ S3 client error during upload: {e}")
                 raise
@@ -175,12 +248,89 @@ class MariaDBRunner:
                 logger.error(f"❌ An unexpected error occurred during backup: {e}")
                 raise
 
-    def _upload_to_s3(self, file_path):
-        """Uploads a file to S3-compatible storage"""
-        logger.info(f"☁️  Uploading {file_path} to s3://{self.storage_bucket}/{self.backup_path}...")
+    def _mydumper_command(self, dump_dir):
+        """mydumper command line for a parallel dump into dump_dir, or None if the installed mydumper can't run it"""
+        if not shutil.which('mydumper'):
+            return None
+        result = subprocess.run(['mydumper', '--help'], capture_output=True)
+        help_text = (result.stdout + result.stderr).decode('utf-8', 'replace')
+
+        def supported(option):
+            return re.search(rf'{re.escape(option.split("=", 1)[0])}(?![\w-])', help_text) is not None
+
+        lock_option = next((option for option in MYDUMPER_LOCK_OPTIONS if supported(option)), MYDUMPER_LOCK_OPTIONS[0])
+        mydumper_cmd = [
+            "mydumper",
+            f"--host={self.db_host}",
+            f"--port={self.db_port}",
+            f"--user={self.db_username}",
+            f"--database={self.db_name}",
+            f"--outputdir={dump_dir}",
+            f"--threads={DUMP_THREADS}",
+            "--rows=1000000",  # Split big tables into chunks so skewed schemas still keep every thread busy
+            "--compress-protocol",
+            "--routines",
+            "--triggers",
+            "--events",
+            lock_option  # LOCK TABLES privilege only; the default global lock needs RELOAD
+        ]
+
+        # Distro builds can be old; fall back rather than fail on an option they reject
+        missing = [arg.split('=', 1)[0] for arg in mydumper_cmd[1:] if not supported(arg)]
+        if missing:
+            logger.warning(f"⚠️  Installed mydumper does not support: {', '.join(missing)}")
+            return None
+        return mydumper_cmd
+
+    def _run_mydumper(self, mydumper_cmd, dump_dir):
+        """Dump the database with parallel mydumper connections; return a command streaming the dump as a tar"""
+        # The MySQL/MariaDB client library behind every mydumper release reads MYSQL_PWD, unlike the newer --defaults-extra-file;
+        # like the option file it keeps the password off argv
+        env = {**os.environ, 'MYSQL_PWD': self.db_password or ''}
+
+        logger.info(f"▶️  Running mydumper with {DUMP_THREADS} threads into {dump_dir}")
+        result = subprocess.run(mydumper_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env)
+        if result.returncode != 0:
+            raise Exception(f"mydumper failed: {result.stderr.decode('utf-8', 'replace')}")
+
+        # The table files are uncompressed; the tar stream goes through the same compressor as a mariadb-dump
+        return ['tar', '-cf', '-', '-C', dump_dir, '.']
+
+    def _write_client_defaults(self, directory):
+        """Write the password to a private option file so it stays off argv and out of the logs"""
+        defaults_file = os.path.join(directory, 'client.cnf')
+        password = (self.db_password or '').replace('\\', '\\\\').replace('"', '\\"')
+        fd = os.open(defaults_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(f'[client]\npassword="{password}"\n')
+        return defaults_file
+
+    def _compress_command(self):
+        """Multi-threaded compressor for the dump stream, falling back to single-threaded gzip"""
+        threads = str(len(os.sched_getaffinity(0)))
+        if self.backup_compression == 'zstd':
+            # --long matches SQL's far-apart repeats over a 128MiB window
+            return ['zstd', '-3', '-T' + threads, '--long=27', '-c']
+        # Level 6 is gzip's own default: about twice as fast as -9 for a few percent larger SQL dumps
+        if shutil.which('pigz'):
+            return ['pigz', '-6', '-p', threads]
+        return ['gzip', '-6']
+
+    def _grow_pipe_buffer(self, pipe):
+        """Enlarge a pipe so each read moves more data (Linux only, best effort)"""
+        if not hasattr(fcntl, 'F_SETPIPE_SZ'):
+            return
+        try:
+            fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, PIPE_BUFFER_SIZE)
+        except OSError as e:
+            logger.debug(f"Could not resize pipe buffer: {e}")
+
+    def _upload_to_s3(self, fileobj):
+        """Streams a file object to S3-compatible storage as a multipart upload"""
+        logger.info(f"☁️  Uploading to s3://{self.storage_bucket}/{self.backup_path}...")
         try:
-            self.s3_client.upload_file(file_path, self.storage_bucket, self.backup_path)
-            logger.info("✅ File uploaded to S3 successfully.")
+            self.s3_client.upload_fileobj(fileobj, self.storage_bucket, self.backup_path, Config=STREAM_TRANSFER_CONFIG)
+            logger.info("✅ Backup streamed to S3 successfully.")
         except NoCredentialsError:
             logger.error("❌ AWS credentials not found or configured.")
             raise
@@ -214,9 +364,9 @@ class MariaDBRunner:
                 "jobId": self.job_id,
                 "status": status,
                 "message": message,
-                "timestamp": datetime.utcnow().isoformat() + "Z"
+                "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
             }
-            response = requests.post(self.callback_url, json=payload, headers=headers, timeout=10)
+            response = self._http.post(self.callback_url, json=payload, headers=headers, timeout=10)
             response.raise_for_status()
             logger.info(f"✅ Callback sent successfully to {self.callback_url} with status {status}")
         except requests.exceptions.RequestException as e:
@@ -222,7 +222,7 @@ class MongoDBIntegrationTest44:
         try:
             # Generate unique backup path
             timestamp = int(time.time())
-            backup_path = f"backups/test/{timestamp}/mongodb-backup.tar.gz"
+            backup_path = f"backups/test/{timestamp}/mongodb-backup.tar"
             
             logger.info("▶️  Running complete backup pipeline using our Plan B container...")
             
@@ -15,12 +15,107 @@ from botocore.exceptions import ClientError, NoCredentialsError
 from datetime import datetime
 import tarfile
 import io
+import base64
+import hashlib
+import collections
+import concurrent.futures
 import requests
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
 logger = logging.getLogger(__name__)
 
+# Multipart parts start at S3's 5MiB minimum and double every 100 parts up to 64MiB:
+# small dumps buffer little, while the 10,000-part cap still allows ~600GB
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PART_SIZE = 64 * 1024 * 1024
+PART_SIZE_DOUBLING_INTERVAL = 100
+
+# Concurrent part uploads; bounds buffered archive data to one part per worker
+MAX_UPLOAD_WORKERS = 8
+# tarfile defaults to 16 KiB reads and 10 KiB records, which dominates CPU on large dumps
+TAR_BUFFER_SIZE = 1024 * 1024
+
+# Trailing mongodump stderr lines kept for the error message
+STDERR_TAIL_LINES = 50
+
+def part_size(part_number):
+    """Size of the given 1-based multipart part"""
+    return min(MAX_PART_SIZE, MIN_PART_SIZE << ((part_number - 1) // PART_SIZE_DOUBLING_INTERVAL))
+
+class _MultipartUploadWriter:
+    """Write-only file object that uploads everything written to it as S3 multipart parts"""
+
+    def __init__(self, s3_client, bucket, key, executor):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.executor = executor
+        self.upload_id = s3_client.create_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            ContentType='application/x-tar'
+        )['UploadId']
+        self.buffer = bytearray()
+        self.part_number = 0
+        self.pending = set()
+        self.parts = []
+        # Whole-archive checksum, computed as the bytes stream past rather than in a second pass
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.buffer += data
+        while len(self.buffer) >= (size := part_size(self.part_number + 1)):
+            self._submit_part(bytes(self.buffer[:size]))
+            del self.buffer[:size]
+        return len(data)
+
+    def _submit_part(self, body):
+        # Bound buffered memory to one part per worker
+        if len(self.pending) >= MAX_UPLOAD_WORKERS:
+            done, self.pending = concurrent.futures.wait(self.pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            self.parts.extend(future.result() for future in done)
+
+        self.part_number += 1
+        self.pending.add(self.executor.submit(self._upload_part, self.part_number, body))
+
+    def _upload_part(self, part_number, body):
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body,
+            ContentMD5=self._content_md5(body)
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def _content_md5(self, body):
+        """Base64 MD5 digest so S3 can reject a part corrupted in transit"""
+        return base64.b64encode(hashlib.md5(body).digest()).decode()
+
+    def complete(self):
+        """Upload the final (possibly short) part and commit the object"""
+        self._submit_part(bytes(self.buffer))
+        self.buffer.clear()
+        self.parts.extend(future.result() for future in self.pending)
+        self.pending = set()
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': sorted(self.parts, key=lambda part: part['PartNumber'])}
+        )
+
+    def abort(self):
+        """Discard any parts already uploaded"""
+        for future in self.pending:
+            future.cancel()
+        # Parts still in flight could land after the abort and keep using storage, so let them finish first
+        concurrent.futures.wait(self.pending)
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
 class MongoDBRunner:
     def __init__(self):
         """Initialize MongoDB runner with environment variables"""
@@ -48,6 +143,9 @@ class MongoDBRunner:
         self.callback_url = os.getenv('CALLBACK_URL')
         self.callback_secret = os.getenv('CALLBACK_SECRET')
 
+        # SHA-256 of the uploaded archive, reported with the success callback
+        self.backup_sha256 = None
+
         logger.info("🔧 Environment variables loaded")
 
         # Validate required environment variables
@@ -133,6 +231,7 @@ class MongoDBRunner:
                     "mongodump",
                     "--host", f"{self.db_host}:{self.db_port}",
                     "--db", self.db_name,
+                    "--gzip",  # Compress each collection file; the archive itself stays uncompressed
                     "--out", temp_dir  # Output to temp_dir, mongodump will create dump/ subdirectory
                 ]
 
@@ -163,25 +262,12 @@ class MongoDBRunner:
                 else:
                     logger.warning(f"⚠️  MongoDB connection test failed: {test_result.stderr}")
                 
-                # Also test mongodump with verbose output
-                logger.info("🔍 Testing mongodump with verbose output...")
-                verbose_cmd = mongodump_cmd + ["--verbose"]
-                verbose_result = subprocess.run(verbose_cmd, capture_output=True, text=True)
-                logger.info(f"🔍 mongodump verbose stderr: {verbose_result.stderr}")
-                logger.info(f"🔍 mongodump verbose stdout: {verbose_result.stdout}")
-                logger.info(f"🔍 mongodump verbose return code: {verbose_result.returncode}")
-                
-                # Now run mongodump normally
-                result = subprocess.run(mongodump_cmd, capture_output=True, text=True)
-                
-                # Debug: always show stderr and stdout
-                if result.stderr:
-                    logger.info(f"🔍 mongodump stderr: {result.stderr}")
-                if result.stdout:
-                    logger.info(f"🔍 mongodump stdout: {result.stdout}")
+                # One verbose run, its progress logged as it arrives rather than buffered
+                returncode, stderr_tail = self._run_logged(mongodump_cmd + ["--verbose"])
+                logger.info(f"🔍 mongodump return code: {returncode}")
                 
-                if result.returncode != 0:
-                    raise Exception(f"mongodump failed: {result.stderr}")
+                if returncode != 0:
+                    raise Exception(f"mongodump failed: {stderr_tail}")
                 
                 # Debug: check what was created
                 logger.info(f"🔍 Checking temp directory contents: {os.listdir(temp_dir)}")
@@ -200,19 +286,10 @@ class MongoDBRunner:
                 
                 logger.info("✅ MongoDB backup created successfully locally.")
 
-                # Create tar.gz archive of the dump directory
-                compressed_file_path = os.path.join(temp_dir, os.path.basename(self.backup_path))
-                logger.info(f"🗜️  Compressing backup to {compressed_file_path}...")
-                
-                with tarfile.open(compressed_file_path, 'w:gz') as tar:
-                    tar.add(dump_dir, arcname='dump')
-                
-                logger.info("✅ Backup compressed successfully.")
-
-                # Upload to S3
-                self._upload_to_s3(compressed_file_path)
+                # Stream a tar of the dump directory to S3; no archive is written locally
+                self._upload_to_s3(dump_dir)
 
-                logger.info("🎉 MongoDB backup, compression, and upload complete!")
+                logger.info("🎉 MongoDB backup and upload complete!")
                 return True
 
             except subprocess.CalledProcessError as e:
@@ -225,12 +302,32 @@ class MongoDBRunner:
                 logger.error(f"❌ An unexpected error occurred during backup: {e}")
                 raise
 
-    def _upload_to_s3(self, file_path):
-        """Uploads a file to S3-compatible storage"""
-        logger.info(f"☁️  Uploading {file_path} to s3://{self.storage_bucket}/{self.backup_path}...")
+    def _run_logged(self, cmd):
+        """Run a command, logging stderr line by line; return the exit code and stderr's tail"""
+        tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+        with subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE) as process:
+            for raw_line in process.stderr:
+                line = raw_line.decode('utf-8', 'replace').rstrip()
+                logger.info(f"🔍 {cmd[0]}: {line}")
+                tail.append(line)
+        return process.returncode, '\n'.join(tail)
+
+    def _upload_to_s3(self, dump_dir):
+        """Streams a tar of the dump directory to S3-compatible storage as a multipart upload"""
+        logger.info(f"☁️  Streaming {dump_dir} to s3://{self.storage_bucket}/{self.backup_path}...")
         try:
-            self.s3_client.upload_file(file_path, self.storage_bucket, self.backup_path)
-            logger.info("✅ File uploaded to S3 successfully.")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_UPLOAD_WORKERS) as executor:
+                writer = _MultipartUploadWriter(self.s3_client, self.storage_bucket, self.backup_path, executor)
+                try:
+                    # 'w|' writes a forward-only stream, which is all the uploader needs
+                    with tarfile.open(fileobj=writer, mode='w|', bufsize=TAR_BUFFER_SIZE, copybufsize=TAR_BUFFER_SIZE) as tar:
+                        tar.add(dump_dir, arcname='dump')
+                    writer.complete()
+                except Exception:
+                    writer.abort()
+                    raise
+            self.backup_sha256 = writer.sha256.hexdigest()
+            logger.info(f"✅ File uploaded to S3 successfully (sha256 {self.backup_sha256}).")
         except NoCredentialsError:
             logger.error("❌ AWS credentials not found or configured.")
             raise
@@ -266,6 +363,8 @@ class MongoDBRunner:
                 "message": message,
                 "timestamp": datetime.utcnow().isoformat() + "Z"
             }
+            if self.backup_sha256:
+                payload["metadata"] = {"object_key": self.backup_path, "sha256": self.backup_sha256}
             response = requests.post(self.callback_url, json=payload, headers=headers, timeout=10)
             response.raise_for_status()
             logger.info(f"✅ Callback sent successfully to {self.callback_url} with status {status}")
@@ -11,16 +11,32 @@ import tempfile
 import logging
 import gzip
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError, NoCredentialsError
 from datetime import datetime
 import tarfile
 import io
+import shutil
+import fcntl
 import requests
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
 logger = logging.getLogger(__name__)
 
+# Default pipes hold 64KiB; 1MiB (the unprivileged maximum) cuts wakeups between dump and compressor
+PIPE_BUFFER_SIZE = 1024 * 1024
+
+# Streamed uploads can't know their size up front; 64MiB parts keep large dumps under S3's 10,000-part cap
+STREAM_TRANSFER_CONFIG = TransferConfig(multipart_chunksize=64 * 1024 * 1024, max_concurrency=8)
+
+# Backup codecs (BACKUP_COMPRESSION); restores detect the codec from the file's magic bytes
+BACKUP_CODECS = ('gzip', 'zstd')
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# zstd level 3 with long-distance matching over a 128MiB window (2**27) catches SQL's far-apart repeats
+ZSTD_LEVEL = 3
+ZSTD_WINDOW_LOG = 27
+
 class MySQLRunner:
     def __init__(self):
         """Initialize MySQL runner with environment variables"""
@@ -47,6 +63,7 @@ class MySQLRunner:
         self.retention_days = os.getenv('RETENTION_DAYS', '30')
         self.callback_url = os.getenv('CALLBACK_URL')
         self.callback_secret = os.getenv('CALLBACK_SECRET')
+        self.backup_compression = os.getenv('BACKUP_COMPRESSION', 'gzip').lower()
 
         logger.info("🔧 Environment variables loaded")
 
@@ -67,6 +84,9 @@ class MySQLRunner:
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
+        if self.backup_compression not in BACKUP_CODECS:
+            raise ValueError(f"Unsupported BACKUP_COMPRESSION: {self.backup_compression}")
+
     def _init_s3_client(self):
         """Initialize S3 client with credentials"""
         try:
@@ -130,17 +150,18 @@ class MySQLRunner:
         logger.info(f"🐬 Creating MySQL backup for database: {self.db_name}")
 
         with tempfile.TemporaryDirectory() as temp_dir:
-            backup_file_name = f"{self.db_name}_backup.sql"
-            backup_file_path = os.path.join(temp_dir, backup_file_name)
+            compressed_file_path = os.path.join(temp_dir, os.path.basename(self.backup_path))
 
             try:
+                defaults_file = self._write_client_defaults(temp_dir)
+
                 # Construct mysqldump command
                 mysqldump_cmd = [
                     "mysqldump",
+                    f"--defaults-extra-file={defaults_file}",
                     f"--host={self.db_host}",
                     f"--port={self.db_port}",
                     f"--user={self.db_username}",
-                    f"--password={self.db_password}",
                     "--single-transaction",
                     "--routines",
                     "--triggers",
@@ -150,25 +171,71 @@ class MySQLRunner:
                     self.db_name
                 ]
 
-                logger.info(f"▶️  Running mysqldump command: {' '.join(mysqldump_cmd[:-1])} {self.db_name}")
-                with open(backup_file_path, 'w') as f:
-                    result = subprocess.run(mysqldump_cmd, stdout=f, stderr=subprocess.PIPE, text=True)
-                
-                if result.returncode != 0:
-                    raise Exception(f"mysqldump failed: {result.stderr}")
-                
-                logger.info("✅ MySQL backup created successfully locally.")
+                # zstd compresses in-process; for gzip, pigz spreads across cores with plain gzip as the fallback
+                if self.backup_compression == 'zstd':
+                    compressor = 'zstd'
+                elif shutil.which('pigz'):
+                    compress_cmd = ['pigz', '-9', '-p', str(len(os.sched_getaffinity(0)))]
+                    compressor = 'pigz'
+                else:
+                    compress_cmd = ['gzip', '-9']
+                    compressor = 'gzip'
 
-                # Compress the backup file
-                compressed_file_path = os.path.join(temp_dir, os.path.basename(self.backup_path))
-                logger.info(f"🗜️  Compressing backup to {compressed_file_path}...")
-                with open(backup_file_path, 'rb') as f_in:
-                    with gzip.open(compressed_file_path, 'wb') as f_out:
-                        f_out.writelines(f_in)
-                logger.info("✅ Backup compressed successfully.")
+                logger.info(f"▶️  Running mysqldump command: {' '.join(mysqldump_cmd[:-1])} {self.db_name}")
 
-                # Upload to S3
-                self._upload_to_s3(compressed_file_path)
+                # boto3 can multipart-upload straight from the compressor; the signed-PUT fallback needs a file
+                stream_upload = self.s3_client is not None and self.s3_client != "http_client"
+                if stream_upload:
+                    logger.info(f"🗜️  Streaming {compressor} output to s3://{self.storage_bucket}/{self.backup_path}...")
+                else:
+                    logger.info(f"🗜️  Compressing backup to {compressed_file_path} with {compressor}...")
+
+                # mysqldump writes straight into the compressor; raw SQL never touches disk
+                with tempfile.TemporaryFile() as dump_log:
+                    dump_proc = subprocess.Popen(mysqldump_cmd, stdout=subprocess.PIPE, stderr=dump_log)
+                    self._grow_pipe_buffer(dump_proc.stdout)
+                    compress_proc = None
+                    completed = False
+                    try:
+                        if compressor == 'zstd':
+                            self._compress_with_zstd(dump_proc.stdout, stream_upload, compressed_file_path)
+                        else:
+                            if stream_upload:
+                                compress_proc = subprocess.Popen(compress_cmd, stdin=dump_proc.stdout, stdout=subprocess.PIPE)
+                                self._grow_pipe_buffer(compress_proc.stdout)
+                            else:
+                                with open(compressed_file_path, 'wb') as f_out:
+                                    compress_proc = subprocess.Popen(compress_cmd, stdin=dump_proc.stdout, stdout=f_out)
+                            # Only the compressor should hold the read end, so it sees EOF/SIGPIPE correctly
+                            dump_proc.stdout.close()
+
+                            if stream_upload:
+                                self.s3_client.upload_fileobj(compress_proc.stdout, self.storage_bucket, self.backup_path, Config=STREAM_TRANSFER_CONFIG)
+                        completed = True
+                    finally:
+                        # Reap both processes even if the upload raised; closing the pipes ends them with SIGPIPE
+                        dump_proc.stdout.close()
+                        if compress_proc is not None and compress_proc.stdout:
+                            compress_proc.stdout.close()
+                        compress_returncode = compress_proc.wait() if compress_proc is not None else 0
+                        dump_returncode = dump_proc.wait()
+
+                        if stream_upload and (not completed or dump_returncode != 0 or compress_returncode != 0):
+                            # Don't leave a truncated dump behind looking like a good backup
+                            self._delete_partial_backup()
+                    if dump_returncode != 0:
+                        dump_log.seek(0)
+                        raise Exception(f"mysqldump failed: {dump_log.read().decode('utf-8', 'replace')}")
+                if compress_returncode != 0:
+                    raise Exception(f"{compressor} failed with exit code {compress_returncode}")
+
+                if stream_upload:
+                    logger.info("✅ MySQL backup compressed and streamed to S3 successfully.")
+                else:
+                    logger.info("✅ MySQL backup created and compressed successfully.")
+
+                    # Upload to S3
+                    self._upload_to_s3(compressed_file_path)
 
                 logger.info("🎉 MySQL backup, compression, and upload complete!")
                 return True
@@ -183,6 +250,52 @@ class MySQLRunner:
                 logger.error(f"❌ An unexpected error occurred during backup: {e}")
                 raise
 
+    def _delete_partial_backup(self):
+        """Best-effort removal of a partially streamed backup object"""
+        try:
+            self.s3_client.delete_object(Bucket=self.storage_bucket, Key=self.backup_path)
+        except Exception as e:
+            logger.warning(f"⚠️  Could not delete partial backup {self.backup_path}: {e}")
+
+    def _compress_with_zstd(self, dump_stdout, stream_upload, compressed_file_path):
+        """Compress the dump in-process with zstd, streaming it to S3 or into the staged file"""
+        import zstandard
+
+        # threads=-1 runs one compression worker per core inside libzstd
+        params = zstandard.ZstdCompressionParameters.from_level(
+            ZSTD_LEVEL,
+            window_log=ZSTD_WINDOW_LOG,
+            enable_ldm=True,
+            threads=-1,
+            write_checksum=True
+        )
+        cctx = zstandard.ZstdCompressor(compression_params=params)
+
+        if stream_upload:
+            with cctx.stream_reader(dump_stdout, read_size=PIPE_BUFFER_SIZE, closefd=False) as reader:
+                self.s3_client.upload_fileobj(reader, self.storage_bucket, self.backup_path, Config=STREAM_TRANSFER_CONFIG)
+        else:
+            with open(compressed_file_path, 'wb') as f_out:
+                cctx.copy_stream(dump_stdout, f_out, read_size=PIPE_BUFFER_SIZE)
+
+    def _write_client_defaults(self, directory):
+        """Write the password to a private option file so it stays off argv and out of the logs"""
+        defaults_file = os.path.join(directory, 'client.cnf')
+        password = (self.db_password or '').replace('\\', '\\\\').replace('"', '\\"')
+        fd = os.open(defaults_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(f'[client]\npassword="{password}"\n')
+        return defaults_file
+
+    def _grow_pipe_buffer(self, pipe):
+        """Enlarge a pipe so each read moves more data (Linux only, best effort)"""
+        if not hasattr(fcntl, 'F_SETPIPE_SZ'):
+            return
+        try:
+            fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, PIPE_BUFFER_SIZE)
+        except OSError as e:
+            logger.debug(f"Could not resize pipe buffer: {e}")
+
     def _upload_to_s3(self, file_path):
         """Uploads a file to S3-compatible storage"""
         if not self.s3_client:
@@ -320,7 +433,8 @@ class MySQLRunner:
                 
                 # Restore to database
                 logger.info(f"🔄 Restoring backup to database: {self.db_name}")
-                self._restore_to_database(extracted_file_path)
+                defaults_file = self._write_client_defaults(temp_dir)
+                self._restore_to_database(extracted_file_path, defaults_file)
                 
                 logger.info("🎉 MySQL backup restore completed successfully!")
                 return True
@@ -428,9 +542,16 @@ class MySQLRunner:
         
         try:
             with open(compressed_file_path, 'rb') as f_in:
-                with gzip.open(f_in, 'rb') as gz_file:
-                    with open(extracted_file_path, 'wb') as f_out:
-                        f_out.write(gz_file.read())
+                is_zstd = f_in.read(len(ZSTD_MAGIC)) == ZSTD_MAGIC
+                f_in.seek(0)
+                with open(extracted_file_path, 'wb') as f_out:
+                    if is_zstd:
+                        import zstandard
+                        dctx = zstandard.ZstdDecompressor(max_window_size=2 ** ZSTD_WINDOW_LOG)
+                        dctx.copy_stream(f_in, f_out)
+                    else:
+                        with gzip.open(f_in, 'rb') as gz_file:
+                            shutil.copyfileobj(gz_file, f_out)
             
             logger.info("✅ Backup file extracted successfully")
             
@@ -438,7 +559,7 @@ class MySQLRunner:
             logger.error(f"❌ Failed to extract backup: {e}")
             raise
 
-    def _restore_to_database(self, sql_file_path):
+    def _restore_to_database(self, sql_file_path, defaults_file):
         """Restore SQL file to MySQL database"""
         logger.info(f"🔄 Restoring SQL file to database: {self.db_name}")
         
@@ -446,10 +567,10 @@ class MySQLRunner:
             # Create database if it doesn't exist
             create_db_cmd = [
                 "mysql",
+                f"--defaults-extra-file={defaults_file}",
                 f"--host={self.db_host}",
                 f"--port={self.db_port}",
                 f"--user={self.db_username}",
-                f"--password={self.db_password}",
                 "-e", f"CREATE DATABASE IF NOT EXISTS {self.db_name};"
             ]
             
@@ -462,10 +583,10 @@ class MySQLRunner:
             # Restore the SQL file
             restore_cmd = [
                 "mysql",
+                f"--defaults-extra-file={defaults_file}",
                 f"--host={self.db_host}",
                 f"--port={self.db_port}",
                 f"--user={self.db_username}",
-                f"--password={self.db_password}",
                 self.db_name
             ]
             
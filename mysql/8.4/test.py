@@ -131,9 +131,23 @@ class MySQLIntegrationTest84(DatabaseTestFramework):
             'DB_PORT': str(self.db_port),  # Use the actual port the container is running on
             'DB_NAME': self.test_db,
             'DB_USERNAME': self.mysql_user,
-            'DB_PASSWORD': self.mysql_password
+            'DB_PASSWORD': self.mysql_password,
+            # gzip runs as a subprocess, so the upload reads straight from the compressor's stdout pipe
+            'BACKUP_COMPRESSION': 'gzip'
         }
 
+    def run_backup_test(self, custom_backup_filename=None):
+        """Run the backup and check it was streamed from the compressor pipe with upload_fileobj"""
+        if not super().run_backup_test(custom_backup_filename):
+            return False
+        
+        if 'streamed to S3' not in self.backup_logs:
+            logger.error("❌ Backup was staged on disk instead of streamed from the compressor pipe")
+            return False
+        
+        logger.info("✅ Backup streamed from the compressor pipe to MinIO")
+        return True
+
     def verify_restored_data(self) -> bool:
         """Verify that restored data matches original test data"""
         logger.info("🔍 Verifying restored data...")
@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 import os
+import re
 import sys
 import subprocess
 import tempfile
 import gzip
+import shutil
+import base64
+import hashlib
+import fcntl
+import functools
 import logging
+import contextlib
+import concurrent.futures
 from datetime import datetime
 
 # Add the shared directory to Python path
@@ -15,6 +23,25 @@ from backup_base import BackupRunnerBase as BackupBase
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Multipart parts start at S3's 5MiB minimum and double every 100 parts up to 64MiB:
+# small dumps buffer little, while the 10,000-part cap still allows ~600GB
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PART_SIZE = 64 * 1024 * 1024
+PART_SIZE_DOUBLING_INTERVAL = 100
+
+# Concurrent part uploads; bounds buffered dump data to one part per worker
+MAX_UPLOAD_WORKERS = 8
+
+# Default pipes hold 64KiB; 1MiB (the unprivileged maximum) cuts the reads per part 16-fold
+PIPE_BUFFER_SIZE = 1024 * 1024
+
+# Parallel pg_dump/pg_restore workers, each holding its own database connection
+DUMP_JOBS = min(8, len(os.sched_getaffinity(0)))
+
+def part_size(part_number):
+    """Size of the given 1-based multipart part"""
+    return min(MAX_PART_SIZE, MIN_PART_SIZE << ((part_number - 1) // PART_SIZE_DOUBLING_INTERVAL))
+
 class PostgreSQLRunner(BackupBase):
     """PostgreSQL 12 backup and restore runner"""
     
@@ -42,20 +69,14 @@ class PostgreSQLRunner(BackupBase):
         logger.info(f"🔍 SSL enabled: {self.ssl_enabled} (mode: {self.ssl_mode})")
         
     def create_backup(self):
-        """Create PostgreSQL backup using pg_dump"""
+        """Create PostgreSQL backup with a parallel pg_dump and stream it to S3/MinIO"""
         logger.info(f"🔄 Creating PostgreSQL backup for database: {self.db_name}")
         
         with tempfile.TemporaryDirectory() as temp_dir:
             try:
-                # 1. Create backup using pg_dump
-                backup_file = os.path.join(temp_dir, f'{self.db_name}_backup.sql')
-                logger.info(f"📦 Creating backup file: {backup_file}")
-                
-                # Set PGPASSWORD environment variable for pg_dump
-                env = os.environ.copy()
-                if self.db_password:
-                    env['PGPASSWORD'] = self.db_password
-                
+                # Directory format dumps tables in parallel and compresses each table file
+                dump_dir = os.path.join(temp_dir, 'dump')
+                compression = self._dump_compression()
                 dump_cmd = [
                     'pg_dump',
                     '-h', self.db_host,
@@ -64,43 +85,71 @@ class PostgreSQLRunner(BackupBase):
                     '-d', self.db_name,
                     '--verbose',
                     '--no-password',
-                    '-f', backup_file
+                    '--format=directory',
+                    f'--jobs={DUMP_JOBS}',
+                    f'--compress={compression}',
+                    '-f', dump_dir
                 ]
                 
                 logger.info(f"🔧 Running pg_dump command: {' '.join(dump_cmd)}")
-                dump_result = subprocess.run(dump_cmd, env=env, capture_output=True, text=True)
+                # --verbose output is logged as it arrives rather than held in memory
+                returncode, stderr_tail = self.run_logged(dump_cmd, env=self.pg_env)
                 
-                if dump_result.returncode != 0:
-                    logger.error(f"❌ pg_dump failed: {dump_result.stderr}")
-                    raise Exception(f"pg_dump failed: {dump_result.stderr}")
+                if returncode != 0:
+                    logger.error(f"❌ pg_dump failed: {stderr_tail}")
+                    raise Exception(f"pg_dump failed: {stderr_tail}")
                 
                 logger.info("✅ PostgreSQL backup created successfully")
                 
-                # 2. Compress the backup
-                compressed_file = f"{backup_file}.tar.gz"
-                logger.info(f"🗜️  Compressing backup to: {compressed_file}")
+                backup_filename = self.backup_path if self.backup_path else f'{self.db_name}_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.tar'
+                logger.info(f"☁️  Streaming backup archive to S3/MinIO: {backup_filename}")
                 
-                import tarfile
-                with tarfile.open(compressed_file, 'w:gz') as tar:
-                    tar.add(backup_file, arcname=os.path.basename(backup_file))
-                        
+                # The tarball is never written locally, only the dump directory
+                self._upload_to_s3(self._archive_stream(dump_dir), backup_filename)
                 
-                logger.info("✅ Backup compressed successfully")
-                
-                # 3. Upload to S3/MinIO
-                backup_filename = self.backup_path if self.backup_path else f'{self.db_name}_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.sql.gz'
-                logger.info(f"☁️  Uploading backup to S3/MinIO: {backup_filename}")
-                
-                # Upload using boto3 directly
-                self._upload_to_s3(compressed_file, backup_filename)
-                
-                logger.info("🎉 PostgreSQL backup, compression, and upload complete!")
+                logger.info("🎉 PostgreSQL backup and upload complete!")
                 return True
                 
             except Exception as e:
                 logger.error(f"❌ Backup failed: {e}")
                 raise
 
+    def _dump_compression(self):
+        """Pick pg_dump's --compress value: zstd where the client supports it (16+), gzip otherwise"""
+        result = subprocess.run(['pg_dump', '--version'], capture_output=True, text=True)
+        match = re.search(r'(\d+)(?:\.\d+)*', result.stdout)
+        if match and int(match.group(1)) >= 16:
+            return 'zstd:3'
+        return '6'
+
+    @contextlib.contextmanager
+    def _archive_stream(self, dump_dir):
+        """Tar the dump directory and yield the archive stream, raising if tar fails"""
+        # Table files are already compressed, so the tarball itself is not
+        with tempfile.TemporaryFile() as tar_log:
+            tar_proc = subprocess.Popen(['tar', '-cf', '-', '-C', dump_dir, '.'], stdout=subprocess.PIPE, stderr=tar_log)
+            self._grow_pipe_buffer(tar_proc.stdout)
+            try:
+                yield tar_proc.stdout
+            finally:
+                tar_proc.stdout.close()
+                returncode = tar_proc.wait()
+            
+            if returncode != 0:
+                tar_log.seek(0)
+                stderr = tar_log.read().decode('utf-8', 'replace')
+                logger.error(f"❌ tar failed: {stderr}")
+                raise Exception(f"tar failed: {stderr}")
+
+    def _grow_pipe_buffer(self, pipe):
+        """Enlarge a pipe so each read moves more data (Linux only, best effort)"""
+        if not hasattr(fcntl, 'F_SETPIPE_SZ'):
+            return
+        try:
+            fcntl.fcntl(pipe.fileno(), fcntl.F_SETPIPE_SZ, PIPE_BUFFER_SIZE)
+        except OSError as e:
+            logger.debug(f"Could not resize pipe buffer: {e}")
+
     def restore_backup(self):
         """Restore PostgreSQL backup using psql"""
         logger.info(f"🔄 Restoring PostgreSQL backup for database: {self.db_name}")
@@ -130,21 +179,44 @@ class PostgreSQLRunner(BackupBase):
                 logger.error(f"❌ Restore failed: {e}")
                 raise
 
-    def _upload_to_s3(self, file_path, backup_filename):
-        """Upload backup to S3/MinIO using boto3"""
+    @functools.cached_property
+    def pg_env(self):
+        """Environment for the PostgreSQL client tools, built once so the password never lands on argv"""
+        env = os.environ.copy()
+        if self.db_password:
+            env['PGPASSWORD'] = self.db_password
+        return env
+
+    @functools.cached_property
+    def s3_client(self):
+        """S3/MinIO client, built on first use and shared by uploads and downloads"""
+        import boto3
+        from botocore.config import Config
+        
+        return boto3.client(
+            's3',
+            endpoint_url=self.storage_endpoint,
+            aws_access_key_id=self.storage_access_key_id,
+            aws_secret_access_key=self.storage_secret_access_key,
+            region_name=self.storage_region,
+            use_ssl=False,
+            # Enough pooled connections that no concurrent part upload waits on the pool
+            config=Config(
+                max_pool_connections=MAX_UPLOAD_WORKERS * 2,
+                retries={'mode': 'adaptive', 'max_attempts': 5},
+                tcp_keepalive=True
+            )
+        )
+
+    def _upload_to_s3(self, dump, backup_filename):
+        """Stream a backup to S3/MinIO as a concurrent multipart upload.
+        
+        Dumps that fit in a single part are sent with one put_object instead.
+        """
         try:
-            import boto3
             from botocore.exceptions import ClientError
             
-            # Create S3 client
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=self.storage_endpoint,
-                aws_access_key_id=self.storage_access_key_id,
-                aws_secret_access_key=self.storage_secret_access_key,
-                region_name=self.storage_region,
-                use_ssl=False
-            )
+            s3_client = self.s3_client
             
             # Create bucket if it doesn't exist (for test environments)
             try:
@@ -161,30 +233,98 @@ class PostgreSQLRunner(BackupBase):
                 else:
                     logger.warning(f"⚠️  Bucket check failed: {e}")
             
-            # Upload file
-            s3_client.upload_file(file_path, self.storage_bucket, backup_filename)
+            upload_id = None
+            # Whole-archive checksum, computed as the bytes stream past rather than in a second pass
+            archive_hash = hashlib.sha256()
+            try:
+                # Parts are only committed once tar has exited cleanly
+                with dump as stream:
+                    first_part = stream.read(part_size(1))
+                    archive_hash.update(first_part)
+                    
+                    # Small dumps skip the initiate/complete round trips
+                    if len(first_part) == part_size(1):
+                        upload_id = s3_client.create_multipart_upload(
+                            Bucket=self.storage_bucket,
+                            Key=backup_filename
+                        )['UploadId']
+                        parts = self._upload_parts(s3_client, stream, backup_filename, upload_id, first_part, archive_hash)
+                
+                if upload_id:
+                    s3_client.complete_multipart_upload(
+                        Bucket=self.storage_bucket,
+                        Key=backup_filename,
+                        UploadId=upload_id,
+                        MultipartUpload={'Parts': parts}
+                    )
+                else:
+                    s3_client.put_object(
+                        Bucket=self.storage_bucket,
+                        Key=backup_filename,
+                        Body=first_part,
+                        ContentMD5=self._content_md5(first_part)
+                    )
+            except Exception:
+                if upload_id:
+                    s3_client.abort_multipart_upload(
+                        Bucket=self.storage_bucket,
+                        Key=backup_filename,
+                        UploadId=upload_id
+                    )
+                raise
+            
             logger.info(f"✅ Backup uploaded to S3/MinIO: {backup_filename}")
+            self.update_job_metadata({'object_key': backup_filename, 'sha256': archive_hash.hexdigest()})
             
         except Exception as e:
             logger.error(f"❌ S3 upload failed: {e}")
             raise
 
+    def _upload_parts(self, s3_client, stream, backup_filename, upload_id, first_part, archive_hash):
+        """Read the rest of the dump in growing parts and upload them concurrently"""
+        parts = []
+        pending = set()
+        part_number = 1
+        chunk = first_part
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_UPLOAD_WORKERS) as executor:
+            while chunk:
+                # Bound buffered memory to one part per worker
+                if len(pending) >= MAX_UPLOAD_WORKERS:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    parts.extend(future.result() for future in done)
+                
+                pending.add(executor.submit(self._upload_part, s3_client, backup_filename, upload_id, part_number, chunk))
+                part_number += 1
+                chunk = stream.read(part_size(part_number))
+                archive_hash.update(chunk)
+            
+            parts.extend(future.result() for future in pending)
+        
+        return sorted(parts, key=lambda part: part['PartNumber'])
+
+    def _upload_part(self, s3_client, backup_filename, upload_id, part_number, body):
+        """Upload a single multipart part and return its completion entry"""
+        response = s3_client.upload_part(
+            Bucket=self.storage_bucket,
+            Key=backup_filename,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+            ContentMD5=self._content_md5(body)
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    def _content_md5(self, body):
+        """Base64 MD5 digest so S3 can reject a part corrupted in transit"""
+        return base64.b64encode(hashlib.md5(body).digest()).decode()
+
     def _download_from_s3(self, backup_filename: str, temp_dir: str) -> str:
         """Download backup from S3/MinIO"""
         try:
             # Try using boto3 first
-            import boto3
-            s3_client = boto3.client(
-                's3',
-                endpoint_url=self.storage_endpoint,
-                aws_access_key_id=self.storage_access_key_id,
-                aws_secret_access_key=self.storage_secret_access_key,
-                region_name=self.storage_region,
-                use_ssl=False
-            )
-            
             local_file = os.path.join(temp_dir, backup_filename)
-            s3_client.download_file(self.storage_bucket, backup_filename, local_file)
+            self.s3_client.download_file(self.storage_bucket, backup_filename, local_file)
             logger.info(f"✅ Downloaded backup using boto3: {local_file}")
             return local_file
             
@@ -230,27 +370,33 @@ class PostgreSQLRunner(BackupBase):
     def _extract_backup(self, compressed_file: str, temp_dir: str) -> str:
         """Extract compressed backup file"""
         try:
-            if compressed_file.endswith('.tar.gz'):
-                # Handle tar.gz files
-                import tarfile
-                with tarfile.open(compressed_file, 'r:gz') as tar:
-                    tar.extractall(temp_dir)
+            import tarfile
+            if tarfile.is_tarfile(compressed_file):
+                # Handle tar archives, whatever the key's suffix says about compression
+                extract_dir = os.path.join(temp_dir, 'extracted')
+                with tarfile.open(compressed_file, 'r:*') as tar:
+                    tar.extractall(extract_dir)
                 
-                # Find the extracted SQL file
-                for file in os.listdir(temp_dir):
-                    if file.endswith('.sql') and file != os.path.basename(compressed_file):
-                        extracted_file = os.path.join(temp_dir, file)
+                # Directory-format dump written by the current runner
+                if os.path.exists(os.path.join(extract_dir, 'toc.dat')):
+                    logger.info(f"✅ Extracted directory-format backup: {extract_dir}")
+                    return extract_dir
+                
+                # Find the extracted SQL file (tar.gz archives from older runners)
+                for file in os.listdir(extract_dir):
+                    if file.endswith('.sql'):
+                        extracted_file = os.path.join(extract_dir, file)
                         logger.info(f"✅ Extracted tar.gz backup: {extracted_file}")
                         return extracted_file
                 
-                raise Exception("No SQL file found in tar.gz archive")
+                raise Exception("No SQL file or pg_dump directory found in tar archive")
                 
             elif compressed_file.endswith('.gz'):
-                # Handle gzipped files
-                extracted_file = compressed_file.replace('.gz', '')
+                # Handle gzipped SQL streams written by pg_dump --compress
+                extracted_file = compressed_file[:-len('.gz')]
                 with gzip.open(compressed_file, 'rb') as f_in:
                     with open(extracted_file, 'wb') as f_out:
-                        f_out.write(f_in.read())
+                        shutil.copyfileobj(f_in, f_out)
                 logger.info(f"✅ Extracted gzipped backup: {extracted_file}")
                 return extracted_file
                 
@@ -264,7 +410,7 @@ class PostgreSQLRunner(BackupBase):
             raise
 
     def _restore_to_database(self, sql_file: str):
-        """Restore SQL file to PostgreSQL database"""
+        """Restore a SQL file or pg_dump directory to PostgreSQL database"""
         try:
             # Create database if it doesn't exist
             create_db_cmd = [
@@ -275,34 +421,50 @@ class PostgreSQLRunner(BackupBase):
                 self.db_name
             ]
             
-            env = os.environ.copy()
-            if self.db_password:
-                env['PGPASSWORD'] = self.db_password
-            
             logger.info(f"🔧 Creating database if it doesn't exist: {self.db_name}")
-            create_result = subprocess.run(create_db_cmd, env=env, capture_output=True, text=True)
+            create_result = subprocess.run(create_db_cmd, env=self.pg_env, capture_output=True, text=True)
             
             if create_result.returncode != 0 and 'already exists' not in create_result.stderr:
                 logger.warning(f"⚠️  Database creation warning: {create_result.stderr}")
             
-            # Restore the SQL file
-            restore_cmd = [
-                'psql',
-                '-h', self.db_host,
-                '-p', str(self.db_port),
-                '-U', self.db_username,
-                '-d', self.db_name,
-                '-f', sql_file
-            ]
+            if os.path.isdir(sql_file):
+                # Directory-format dumps restore table data in parallel
+                restore_cmd = [
+                    'pg_restore',
+                    '-h', self.db_host,
+                    '-p', str(self.db_port),
+                    '-U', self.db_username,
+                    '-d', self.db_name,
+                    '--no-password',
+                    # Like the old psql restore, don't require the source server's roles or grants on the target
+                    '--no-owner',
+                    '--no-privileges',
+                    f'--jobs={DUMP_JOBS}',
+                    sql_file
+                ]
+            else:
+                # Restore the SQL file
+                restore_cmd = [
+                    'psql',
+                    '-h', self.db_host,
+                    '-p', str(self.db_port),
+                    '-U', self.db_username,
+                    '-d', self.db_name,
+                    '-f', sql_file
+                ]
             
-            logger.info(f"🔧 Restoring SQL file: {sql_file}")
-            restore_result = subprocess.run(restore_cmd, env=env, capture_output=True, text=True)
+            logger.info(f"🔧 Restoring backup: {sql_file}")
+            # psql echoes a line per statement; discard stdout and log stderr as it arrives
+            returncode, stderr_tail = self.run_logged(restore_cmd, env=self.pg_env)
             
-            if restore_result.returncode == 0:
+            if returncode == 0:
                 logger.info("✅ PostgreSQL restore completed successfully")
+            elif restore_cmd[0] == 'pg_restore' and 'errors ignored on restore' in stderr_tail:
+                # pg_restore exits 1 after skipping failed statements; psql -f carried on past them and exited 0
+                logger.warning(f"⚠️  PostgreSQL restore completed with warnings: {stderr_tail}")
             else:
-                logger.error(f"❌ PostgreSQL restore failed: {restore_result.stderr}")
-                raise Exception(f"PostgreSQL restore failed: {restore_result.stderr}")
+                logger.error(f"❌ PostgreSQL restore failed: {stderr_tail}")
+                raise Exception(f"PostgreSQL restore failed: {stderr_tail}")
                 
         except Exception as e:
             logger.error(f"❌ Failed to restore to database: {e}")
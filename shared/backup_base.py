@@ -8,66 +8,173 @@ import os
 import sys
 import json
 import subprocess
+import shutil
 import requests
+import boto3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from dataclasses import dataclass
+from typing import Optional
 from datetime import datetime
 import tempfile
 import logging
+import contextlib
+import collections
+import queue
+import threading
+import atexit
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Parallel multipart uploads for anything above 8MiB, in 64MiB parts
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=64 * 1024 * 1024,
+    max_concurrency=16,
+    use_threads=True
+)
+
+# Trailing stderr lines kept for error messages when a command's stderr is streamed to the log
+STDERR_TAIL_LINES = 50
+
+# DB_ENGINE aliases, resolved once when the job config is loaded
+ENGINE_ALIASES = {'postgres': 'postgresql', 'mongo': 'mongodb'}
+
+# Compressor threads; PIGZ_THREADS overrides the CPUs this process may run on
+COMPRESS_THREADS = int(os.environ.get('PIGZ_THREADS') or len(os.sched_getaffinity(0)))
+
+# Engines whose dump tools already compress their output
+SELF_COMPRESSED_ENGINES = {'postgresql', 'mongodb'}
+
+# Where local backup files are staged; BACKUP_TMPDIR=/dev/shm keeps dumps that fit in RAM off disk
+BACKUP_TMPDIR = os.environ.get('BACKUP_TMPDIR') or None
+
+@dataclass(slots=True, frozen=True)
+class ConnectionConfig:
+    """Database connection settings"""
+    engine: str
+    host: str
+    port: int
+    database: str
+    username: str
+    password: str
+    auth_database: Optional[str] = None
+
+@dataclass(slots=True, frozen=True)
+class StorageConfig:
+    """S3-compatible storage settings"""
+    type: str
+    endpoint: str
+    bucket: str
+    region: str
+    access_key_id: str
+    secret_access_key: str
+
+@dataclass(slots=True, frozen=True)
+class JobConfig:
+    """Backup job configuration, resolved once from the environment"""
+    job_id: str
+    connection: ConnectionConfig
+    storage: StorageConfig
+    backup_path: str
+    retention_days: int
+    callback_url: str
+    callback_secret: str
+
+def normalize_engine(engine):
+    """Canonical lowercase engine name, with aliases such as 'postgres' folded in"""
+    engine = engine.strip().lower()
+    return ENGINE_ALIASES.get(engine, engine)
+
 class BackupRunnerBase:
     def __init__(self):
         self.job_config = self.load_job_config()
         self.setup_storage_credentials()
         
+        # One S3 client for the whole run; its pool covers every concurrent transfer thread
+        storage = self.job_config.storage
+        self._s3 = boto3.Session().client(
+            's3',
+            endpoint_url=storage.endpoint if storage.type != 's3' else None,
+            config=Config(
+                max_pool_connections=32,
+                retries={'mode': 'adaptive', 'max_attempts': 5},
+                tcp_keepalive=True
+            )
+        )
+        
+        # Reuse one authenticated connection pool for all callbacks
+        self.http = requests.Session()
+        callback_adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        )
+        self.http.mount('http://', callback_adapter)
+        self.http.mount('https://', callback_adapter)
+        self.http.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f"Bearer {self.job_config.callback_secret}"
+        })
+        
+        # Callbacks are posted in the background so a slow API never stalls the backup;
+        # the queue is drained at interpreter exit, including after sys.exit()
+        self._cb_queue = queue.Queue()
+        threading.Thread(target=self._callback_worker, daemon=True).start()
+        atexit.register(self._cb_queue.join)
+        
     def load_job_config(self):
         """Load job configuration from environment variables"""
+        env = os.environ
         try:
-            return {
-                'job_id': os.environ['JOB_ID'],
-                'connection': {
-                    'engine': os.environ['DB_ENGINE'],
-                    'host': os.environ['DB_HOST'],
-                    'port': int(os.environ['DB_PORT']),
-                    'database': os.environ['DB_NAME'],
-                    'username': os.environ['DB_USERNAME'],
-                    'password': os.environ['DB_PASSWORD'],
-                },
-                'storage': {
-                    'type': os.environ['STORAGE_TYPE'],
-                    'endpoint': os.environ['STORAGE_ENDPOINT'],
-                    'bucket': os.environ['STORAGE_BUCKET'],
-                    'region': os.environ['STORAGE_REGION'],
-                    'access_key_id': os.environ['STORAGE_ACCESS_KEY_ID'],
-                    'secret_access_key': os.environ['STORAGE_SECRET_ACCESS_KEY'],
-                },
-                'backup_path': os.environ['BACKUP_PATH'],
-                'retention_days': int(os.environ.get('RETENTION_DAYS', '30')),
-                'callback_url': os.environ['CALLBACK_URL'],
-                'callback_secret': os.environ['CALLBACK_SECRET'],
-            }
+            return JobConfig(
+                job_id=env['JOB_ID'],
+                connection=ConnectionConfig(
+                    engine=normalize_engine(env['DB_ENGINE']),
+                    host=env['DB_HOST'],
+                    port=int(env['DB_PORT']),
+                    database=env['DB_NAME'],
+                    username=env['DB_USERNAME'],
+                    password=env['DB_PASSWORD'],
+                    auth_database=env.get('DB_AUTH_DATABASE'),
+                ),
+                storage=StorageConfig(
+                    type=env['STORAGE_TYPE'],
+                    endpoint=env['STORAGE_ENDPOINT'],
+                    bucket=env['STORAGE_BUCKET'],
+                    region=env['STORAGE_REGION'],
+                    access_key_id=env['STORAGE_ACCESS_KEY_ID'],
+                    secret_access_key=env['STORAGE_SECRET_ACCESS_KEY'],
+                ),
+                backup_path=env['BACKUP_PATH'],
+                retention_days=int(env.get('RETENTION_DAYS', '30')),
+                callback_url=env['CALLBACK_URL'],
+                callback_secret=env['CALLBACK_SECRET'],
+            )
         except KeyError as e:
             logger.error(f"Missing required environment variable: {e}")
             sys.exit(1)
     
     def setup_storage_credentials(self):
         """Setup storage credentials for S3-compatible operations"""
-        storage = self.job_config['storage']
+        storage = self.job_config.storage
         
-        # Configure AWS CLI
-        os.environ['AWS_ACCESS_KEY_ID'] = storage['access_key_id']
-        os.environ['AWS_SECRET_ACCESS_KEY'] = storage['secret_access_key']
-        os.environ['AWS_DEFAULT_REGION'] = storage['region']
+        # Configure the AWS SDK
+        os.environ['AWS_ACCESS_KEY_ID'] = storage.access_key_id
+        os.environ['AWS_SECRET_ACCESS_KEY'] = storage.secret_access_key
+        os.environ['AWS_DEFAULT_REGION'] = storage.region
         
         # Set custom endpoint if not AWS S3
-        if storage['type'] != 's3':
-            os.environ['AWS_ENDPOINT_URL'] = storage['endpoint']
+        if storage.type != 's3':
+            os.environ['AWS_ENDPOINT_URL'] = storage.endpoint
     
     def run_backup(self):
         """Execute the backup process - to be implemented by subclasses"""
-        logger.info(f"Starting backup job {self.job_config['job_id']}")
+        logger.info(f"Starting backup job {self.job_config.job_id}")
         
         try:
             # Update job status to running
@@ -88,7 +195,7 @@ class BackupRunnerBase:
             # Update job status to success
             self.update_job_status('success', 'Backup completed successfully')
             
-            logger.info(f"Backup job {self.job_config['job_id']} completed successfully")
+            logger.info(f"Backup job {self.job_config.job_id} completed successfully")
             
         except Exception as e:
             logger.error(f"Backup failed: {str(e)}")
@@ -104,42 +211,101 @@ class BackupRunnerBase:
         if backup_file.endswith('.gz'):
             return backup_file
         
+        # Recompressing already-compressed dumps costs CPU for no real size gain
+        if self.job_config.connection.engine in SELF_COMPRESSED_ENGINES:
+            return backup_file
+        
         compressed_file = f"{backup_file}.gz"
         
-        cmd = ['gzip', '-9', backup_file]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        cmd = self.compress_command() + [backup_file]
+        result = subprocess.run(cmd, capture_output=True)
         
         if result.returncode != 0:
-            raise Exception(f"Compression failed: {result.stderr}")
+            raise Exception(f"Compression failed: {result.stderr.decode('utf-8', 'replace')}")
         
         logger.info(f"Backup compressed: {compressed_file}")
         return compressed_file
     
+    def compress_command(self, level=9):
+        """gzip-compatible compressor command line, for files or as a pipe filter"""
+        # pigz spreads DEFLATE across all available cores; fall back to gzip without it
+        if shutil.which('pigz'):
+            return ['pigz', f'-{level}', '-p', str(COMPRESS_THREADS)]
+        return ['gzip', f'-{level}']
+    
+    def run_compressed(self, cmd, backup_file, env=None, level=1):
+        """Run a dump command with stdout piped through the compressor into backup_file; return its exit code and stderr's tail"""
+        compress_cmd = self.compress_command(level)
+        with open(backup_file, 'wb') as f:
+            compress_proc = subprocess.Popen(compress_cmd, stdin=subprocess.PIPE, stdout=f)
+            try:
+                returncode, stderr_tail = self.run_logged(cmd, env=env, stdout=compress_proc.stdin)
+            finally:
+                compress_proc.stdin.close()
+                compress_returncode = compress_proc.wait()
+        
+        if compress_returncode != 0:
+            raise Exception(f"{compress_cmd[0]} failed with exit code {compress_returncode}")
+        return returncode, stderr_tail
+    
     def upload_backup(self, backup_file):
         """Upload backup to S3-compatible storage"""
-        storage = self.job_config['storage']
-        s3_key = self.job_config['backup_path']
+        storage = self.job_config.storage
+        s3_key = self.job_config.backup_path
         
-        # Build AWS CLI command
-        cmd = ['aws', 's3', 'cp', backup_file, f"s3://{storage['bucket']}/{s3_key}"]
-        
-        # Add endpoint URL for non-AWS S3
-        if storage['type'] != 's3':
-            cmd.extend(['--endpoint-url', storage['endpoint']])
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            raise Exception(f"S3 upload failed: {result.stderr}")
+        try:
+            self._s3.upload_file(backup_file, storage.bucket, s3_key, Config=UPLOAD_TRANSFER_CONFIG)
+        except Exception as e:
+            raise Exception(f"S3 upload failed: {e}")
         
         # Get file size
         file_size = os.path.getsize(backup_file)
         
-        logger.info(f"Backup uploaded to {storage['bucket']}/{s3_key} ({file_size} bytes)")
+        # The dump is never read again, so don't let it evict other processes' cached pages
+        self.drop_page_cache(backup_file)
+        
+        logger.info(f"Backup uploaded to {storage.bucket}/{s3_key} ({file_size} bytes)")
         
         # Update job with file size
         self.update_job_metadata({'bytes': file_size, 'object_key': s3_key})
     
+    def run_logged(self, cmd, env=None, stdin=None, stdout=subprocess.DEVNULL):
+        """Run a command, logging stderr line by line instead of buffering it; return the exit code and stderr's tail"""
+        tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+        # No preexec_fn/user/group: those force a full fork() of this process instead of CPython's vfork spawn
+        # Lines stay bytes unless logged; only the tail that is returned gets decoded
+        debug = logger.isEnabledFor(logging.DEBUG)
+        with subprocess.Popen(cmd, stdin=stdin, stdout=stdout, stderr=subprocess.PIPE, env=env) as process:
+            for raw_line in process.stderr:
+                if debug:
+                    logger.debug(f"{cmd[0]}: {raw_line.decode('utf-8', 'replace').rstrip()}")
+                tail.append(raw_line)
+        
+        return process.returncode, b''.join(tail).decode('utf-8', 'replace').rstrip()
+    
+    def drop_page_cache(self, path):
+        """Ask the kernel to evict a file's pages from the page cache"""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    
+    @contextlib.contextmanager
+    def backup_tempfile(self, suffix):
+        """Yield a new temp file path under BACKUP_TMPDIR, removing the file if the body raises"""
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=BACKUP_TMPDIR)
+        os.close(fd)
+        try:
+            yield path
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+            raise
+    
     def cleanup_files(self, *files):
         """Clean up temporary files"""
         for file in files:
@@ -148,56 +314,70 @@ class BackupRunnerBase:
                 logger.info(f"Cleaned up: {file}")
     
     def update_job_status(self, status, message=None):
-        """Update job status via callback to Plan B API"""
-        try:
-            payload = {
-                'job_id': self.job_config['job_id'],
-                'status': status,
-                'message': message,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            }
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f"Bearer {self.job_config['callback_secret']}"
-            }
-            
-            response = requests.post(
-                self.job_config['callback_url'],
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
-            
-            response.raise_for_status()
-            logger.info(f"Job status updated to: {status}")
-            
-        except Exception as e:
-            logger.warning(f"Failed to update job status: {e}")
+        """Queue a job status update for the Plan B API"""
+        payload = {
+            'job_id': self.job_config.job_id,
+            'status': status,
+            'message': message,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
+        self._cb_queue.put_nowait((self.job_config.callback_url, payload))
     
     def update_job_metadata(self, metadata):
-        """Update job metadata via callback to Plan B API"""
-        try:
-            payload = {
-                'job_id': self.job_config['job_id'],
-                'metadata': metadata,
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            }
-            
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f"Bearer {self.job_config['callback_secret']}"
-            }
+        """Queue a job metadata update for the Plan B API"""
+        payload = {
+            'job_id': self.job_config.job_id,
+            'metadata': metadata,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
+        self._cb_queue.put_nowait((f"{self.job_config.callback_url}/metadata", payload))
+    
+    def _callback_worker(self):
+        """Post queued callbacks in order, collapsing back-to-back updates to the same status"""
+        while True:
+            batch = [self._cb_queue.get()]
+            while True:
+                try:
+                    batch.append(self._cb_queue.get_nowait())
+                except queue.Empty:
+                    break
             
-            response = requests.post(
-                f"{self.job_config['callback_url']}/metadata",
-                json=payload,
-                headers=headers,
-                timeout=30
-            )
+            for index, (url, payload) in enumerate(batch):
+                # A newer update with the same status supersedes this one
+                superseded = (
+                    index + 1 < len(batch)
+                    and 'status' in payload
+                    and batch[index + 1][1].get('status') == payload['status']
+                )
+                if not superseded:
+                    self._post_callback(url, payload)
             
+            for _ in batch:
+                self._cb_queue.task_done()
+    
+    def _post_callback(self, url, payload):
+        """Send one callback to the Plan B API"""
+        kind = 'status' if 'status' in payload else 'metadata'
+        try:
+            response = self.http.post(url, json=payload, timeout=30)
             response.raise_for_status()
-            logger.info("Job metadata updated")
+            if kind == 'status':
+                logger.info(f"Job status updated to: {payload['status']}")
+            else:
+                logger.info("Job metadata updated")
             
         except Exception as e:
-            logger.warning(f"Failed to update job metadata: {e}")
+            logger.warning(f"Failed to update job {kind}: {e}")
+
+
+def cli_main(runner_cls):
+    """Run a backup, or `restore <backup_file>`, from the command line"""
+    runner = runner_cls()
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'restore':
+        if len(sys.argv) < 3:
+            print("Usage: python runner.py restore <backup_file>")
+            sys.exit(1)
+        runner.restore_backup(sys.argv[2])
+    else:
+        runner.run_backup()
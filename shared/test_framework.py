@@ -49,6 +49,9 @@ class DatabaseTestFramework(ABC):
         self.container_name = None
         self.minio_container_name = None
         
+        # Output of the last backup container run, for engine-specific checks
+        self.backup_logs = ''
+        
         # Dynamic ports to avoid conflicts
         self.db_port = default_port + int(time.time()) % 1000
         self.minio_port = 9000 + int(time.time()) % 1000
@@ -236,6 +239,7 @@ class DatabaseTestFramework(ABC):
             # Wait for the backup container to complete
             result = backup_container.wait()
             logs = backup_container.logs().decode('utf-8')
+            self.backup_logs = logs
             
             # Remove the backup container
             backup_container.remove()